@@ -1,50 +1,21 @@
+import codecs
 import os
+import queue
+import threading
+import time
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-import difflib
-
-# Define delimiters
-DELIMITERS = {
-    'Pipe (|)': '|',
-    'Backslash (\\)': '\\',
-    'Forward Slash (/)': '/',
-    'Comma (,)': ',',
-    'Colon (:)': ':',
-    'Semicolon (;)': ';',
-    'Tab (\\t)': '\t',
-    'New Line (\\n)': '\n',
-    'Space ( )': ' ',
-    'Double Colon (::)': '::',
-    'Tilde (~)': '~'
-}
-
-def clean_col_name(col):
-    if col.startswith('\ufeff'):
-        col = col[1:]
-    return col.strip()
-
-def get_header(file_path, delimiter):
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            first_line = f.readline().strip('\r\n')
-            if not first_line:
-                return None, "Header missing"
-            if delimiter is None:
-                cols = first_line.split()
-            else:
-                try:
-                    cols = first_line.split(delimiter)
-                except Exception:
-                    cols = first_line.split()  # Fallback to whitespace
-            return cols, None
-    except Exception as e:
-        return None, str(e)
-
-def find_files(folder):
-    files = [f for f in os.listdir(folder)
-             if os.path.isfile(os.path.join(folder, f)) and f.lower().endswith(('.txt', '.csv'))]
-    files.sort()
-    return files
+
+from header_engine import (DELIMITERS, DEFAULT_WORKERS, REORDER_MOVES, REORDER_POSITION, RULE, HeaderStore, WatchSession,
+                           find_files, match_files, detect_delimiters, iter_report, write_report)
+from header_cache import HeaderCache, DEFAULT_CACHE_PATH
+from column_renames import DEFAULT_RENAME_CUTOFF
+from header_reader import DEFAULT_FALLBACK_ENCODING
+from folder_scan import DEFAULT_EXTENSIONS, parse_extensions
+from folder_watch import DEFAULT_INTERVAL
+from run_manifest import MANIFEST_SUFFIX, RunManifest
+from run_stats import STATS_SUFFIX, RunStats, timed
+from schema_index import CELL_MATCH, SchemaIndex, folder_labels, iter_nway_report
 
 class HeaderCompareApp(tk.Tk):
     def __init__(self):
@@ -61,22 +32,56 @@ class HeaderCompareApp(tk.Tk):
         self.report_file = tk.StringVar()
         self.delimiter_name = tk.StringVar(value='None')
         self.override_custom_delim = tk.StringVar(value='')  # For override custom delimiter input
+        self.workers = tk.IntVar(value=DEFAULT_WORKERS)  # concurrent header reads
+        self.use_cache = tk.BooleanVar(value=False)  # persistent header cache across launches
+        self.reorder_mode = tk.StringVar(value=REORDER_POSITION)
+        self.group_results = tk.BooleanVar(value=False)  # one report block per distinct result
+        self.incremental = tk.BooleanVar(value=False)  # reuse unchanged results via a manifest next to the report
+        self.save_stats = tk.BooleanVar(value=False)  # stats footer in the report and a JSON sidecar next to it
+        self.suggest_renames = tk.BooleanVar(value=False)  # pair missing/extra columns with similar names
+        self.sample_rows = tk.IntVar(value=0)  # data rows read to confirm detected delimiters
+        self.fallback_encoding = tk.StringVar(value=DEFAULT_FALLBACK_ENCODING)  # code page for non-UTF headers
+        self.recursive = tk.BooleanVar(value=False)  # scan subfolders, pairing files by relative path
+        self.scan_archives = tk.BooleanVar(value=True)  # list zip/tar members as files
+        self.extensions = tk.StringVar(value=', '.join(DEFAULT_EXTENSIONS))
+        self.include_patterns = tk.StringVar(value='')  # ';'-separated globs
+        self.exclude_patterns = tk.StringVar(value='')
         
 
         self.main_files = []
         self.comp_files = []
 
-        self.match_vars = {}
+        # main file -> {'iid', 'match', 'delim' (delimiter name), 'custom' (custom delimiter),
+        #               'original' (detected name), 'confidence' (of the detection, 0..1)}
         self.rows = {}
-        self.delim_vars = {}
-        self.delim_custom_vars = {}  # per-file custom delimiter entry variables
-        self.original_delim_values = {}
+        self.iid_to_file = {}
+        self.editing = None  # (iid, column, editor widget) of the cell being edited in place
+
+        # Headers read during Load are reused by the delimiter grid and Compare until a file changes
+        self.store = HeaderStore()
 
         self.override_delimiter = None  # stores delimiter character or None
         self.override_custom_active = False
 
+        # Background comparison: worker thread, its cancel flag and the progress it reports
+        self.worker = None
+        self.cancel_event = threading.Event()
+        self.run_state = {}
+        self.run_started = 0.0
+        self.status_text = tk.StringVar(value='')
+        # Stats of the last Load (scan, match, read, detect) and of the last Load + Compare
+        self.load_stats = None
+        self.last_stats = None
+
+        # Watch mode: polling thread, its stop flag and the updates it hands to the Tk thread
+        self.watch_thread = None
+        self.watch_stop = threading.Event()
+        self.watch_queue = queue.Queue()
+        self.watch_added = 0  # rows added by watch mode, for unique Treeview iids
+
         self.setup_ui()
         self.setup_style()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def setup_style(self):
         style = ttk.Style(self)
@@ -87,6 +92,8 @@ class HeaderCompareApp(tk.Tk):
         style.configure('TButton', font=("Segoe UI", 10, "bold"), foreground="#fff", background="#0078d7", padding=6)
         style.map('TButton', background=[('active','#005a9e'), ('disabled','#a6a6a6')])
         style.configure('TCombobox', fieldbackground='#fff', background='#fff', foreground='#333', font=("Segoe UI",10))
+        style.configure('Treeview', font=("Segoe UI",10), rowheight=26)
+        style.configure('Treeview.Heading', font=("Segoe UI", 11, "bold"))
 
     def show_dev_info(self):
         popup = tk.Toplevel(self)
@@ -155,36 +162,116 @@ class HeaderCompareApp(tk.Tk):
         ttk.Button(delim_frame, text="Apply", command=self.apply_override_delimiter).grid(row=0, column=2, padx=(5, 2), pady=2)
         ttk.Button(delim_frame, text="Reset", command=self.reset_override_delimiter).grid(row=0, column=3, pady=2)
 
+        ttk.Label(frm, text="Parallel Reads:").grid(row=4, column=0, sticky='w')
+        opts_frame = ttk.Frame(frm)
+        opts_frame.grid(row=4, column=1, sticky='w')
+        ttk.Spinbox(opts_frame, from_=1, to=64, textvariable=self.workers, width=5).grid(row=0, column=0, pady=2)
+        ttk.Label(opts_frame, text="Sample Rows:").grid(row=0, column=3, padx=(15, 5))
+        ttk.Spinbox(opts_frame, from_=0, to=100, textvariable=self.sample_rows, width=5).grid(row=0, column=4, pady=2)
+        ttk.Label(opts_frame, text="Fallback Code Page:").grid(row=0, column=5, padx=(15, 5))
+        ttk.Entry(opts_frame, textvariable=self.fallback_encoding, width=10).grid(row=0, column=6, pady=2)
+        ttk.Checkbutton(opts_frame, text="Persistent header cache", variable=self.use_cache,
+                        command=self.toggle_cache).grid(row=0, column=1, padx=(15, 0), pady=2)
+        ttk.Checkbutton(opts_frame, text="Report only minimal column moves", variable=self.reorder_mode,
+                        onvalue=REORDER_MOVES, offvalue=REORDER_POSITION).grid(row=0, column=2, padx=(15, 0), pady=2)
+        ttk.Checkbutton(opts_frame, text="Group identical results", variable=self.group_results).grid(
+            row=0, column=7, padx=(15, 0), pady=2)
+        ttk.Checkbutton(opts_frame, text="Reuse unchanged results", variable=self.incremental).grid(
+            row=0, column=8, padx=(15, 0), pady=2)
+        ttk.Checkbutton(opts_frame, text="Write run stats", variable=self.save_stats).grid(
+            row=0, column=9, padx=(15, 0), pady=2)
+        ttk.Checkbutton(opts_frame, text="Suggest renamed columns", variable=self.suggest_renames,
+                        command=self.toggle_renames).grid(row=0, column=10, padx=(15, 0), pady=2)
+
+        ttk.Label(frm, text="Scan Files:").grid(row=5, column=0, sticky='w')
+        scan_frame = ttk.Frame(frm)
+        scan_frame.grid(row=5, column=1, sticky='w')
+        ttk.Checkbutton(scan_frame, text="Include subfolders", variable=self.recursive).grid(row=0, column=0, pady=2)
+        ttk.Checkbutton(scan_frame, text="Look inside archives", variable=self.scan_archives).grid(row=0, column=1,
+                                                                                              padx=(15, 0), pady=2)
+        ttk.Label(scan_frame, text="Extensions:").grid(row=0, column=2, padx=(15, 5))
+        ttk.Entry(scan_frame, textvariable=self.extensions, width=20).grid(row=0, column=3, pady=2)
+        ttk.Label(scan_frame, text="Include:").grid(row=0, column=4, padx=(15, 5))
+        ttk.Entry(scan_frame, textvariable=self.include_patterns, width=20).grid(row=0, column=5, pady=2)
+        ttk.Label(scan_frame, text="Exclude:").grid(row=0, column=6, padx=(15, 5))
+        ttk.Entry(scan_frame, textvariable=self.exclude_patterns, width=20).grid(row=0, column=7, pady=2)
+
         frm.columnconfigure(1, weight=1)
 
 
 
+        # One Treeview row per main file; cells are edited through a single shared overlay
+        # widget, so the grid stays light no matter how many files are loaded
         self.files_frame = ttk.Frame(self)
         self.files_frame.pack(padx=10, pady=10, fill='both', expand=True)
-        canvas = tk.Canvas(self.files_frame, bg="#f5f7fa", highlightthickness=0)
-        sb = ttk.Scrollbar(self.files_frame, orient='vertical', command=canvas.yview)
-        self.scrollable = ttk.Frame(canvas)
-        self.scrollable.bind('<Configure>', lambda e: canvas.configure(scrollregion=canvas.bbox('all')))
-        canvas.create_window((0,0), window=self.scrollable, anchor='nw')
-        canvas.configure(yscrollcommand=sb.set)
-        canvas.pack(side='left', fill='both', expand=True)
+        self.tree = ttk.Treeview(self.files_frame, columns=('match', 'delim', 'confidence', 'columns', 'encoding', 'result'), selectmode='extended')
+        self.tree.heading('#0', text="Main File", anchor='w')
+        self.tree.heading('match', text="Match Comp File", anchor='w')
+        self.tree.heading('delim', text="Delimiter", anchor='w')
+        self.tree.heading('confidence', text="Confidence", anchor='w')
+        self.tree.heading('columns', text="Columns", anchor='w')
+        self.tree.heading('encoding', text="Encoding", anchor='w')
+        self.tree.heading('result', text="Watch Result", anchor='w')
+        self.tree.column('#0', width=320)
+        self.tree.column('match', width=320)
+        self.tree.column('delim', width=160, stretch=False)
+        self.tree.column('confidence', width=100, stretch=False)
+        self.tree.column('columns', width=110, stretch=False)
+        self.tree.column('encoding', width=160, stretch=False)
+        self.tree.column('result', width=130, stretch=False)
+        sb = ttk.Scrollbar(self.files_frame, orient='vertical', command=self.tree.yview)
+        self.tree.configure(yscrollcommand=lambda *a: (sb.set(*a), self.place_editor()))
+        self.tree.pack(side='left', fill='both', expand=True)
         sb.pack(side='right', fill='y')
+        self.tree.bind('<Double-1>', self.begin_edit)
+        self.tree.bind('<Delete>', lambda e: self.remove_selected())
+        self.tree.bind('<Configure>', lambda e: self.place_editor())
+        self.tree.bind('<ButtonPress-1>', self.on_tree_click)
+
+        self.cell_combo = ttk.Combobox(self.tree, state='readonly')
+        self.cell_combo.bind('<<ComboboxSelected>>', lambda e: self.commit_edit(self.cell_combo.get()))
+        self.cell_combo.bind('<Escape>', lambda e: self.end_edit())
+        self.cell_entry = ttk.Entry(self.tree)
+        self.cell_entry.bind('<Return>', lambda e: self.commit_edit(self.cell_entry.get()))
+        self.cell_entry.bind('<FocusOut>', lambda e: self.commit_edit(self.cell_entry.get()))
+        self.cell_entry.bind('<Escape>', lambda e: self.end_edit())
+
+        statusfrm = ttk.Frame(self)
+        statusfrm.pack(padx=10, pady=(0, 5), fill='x')
+        self.progress = ttk.Progressbar(statusfrm, mode='determinate', length=300)
+        self.progress.pack(side='left')
+        ttk.Label(statusfrm, textvariable=self.status_text).pack(side='left', padx=10)
 
         btnfrm = ttk.Frame(self)
         btnfrm.pack(padx=10, pady=10, fill='x')
 
-        btn_load = ttk.Button(btnfrm, text="Load Files", command=self.load_files)
-        btn_load.grid(row=0, column=0, sticky='w', padx=5)
+        self.btn_load = ttk.Button(btnfrm, text="Load Files", command=self.load_files)
+        self.btn_load.grid(row=0, column=0, sticky='w', padx=5)
+
+        self.btn_remove = ttk.Button(btnfrm, text="Remove Selected", command=self.remove_selected)
+        self.btn_remove.grid(row=0, column=1, sticky='w', padx=5)
 
         btn_info = ttk.Button(btnfrm, text="App Info", command=self.show_dev_info)
-        btn_info.grid(row=0, column=2, padx=5)
+        btn_info.grid(row=0, column=3, padx=5)
 
-        btn_compare = ttk.Button(btnfrm, text="Compare", command=self.compare_and_save_report)
-        btn_compare.grid(row=0, column=4, sticky='e', padx=5)
+        btn_stats = ttk.Button(btnfrm, text="Last Run Stats", command=self.show_run_stats)
+        btn_stats.grid(row=0, column=4, sticky='w', padx=5)
 
-        # Add empty columns 1 and 3 that expand, pushing buttons apart and centering the middle button
-        btnfrm.columnconfigure(1, weight=1)
-        btnfrm.columnconfigure(3, weight=1)
+        self.btn_watch = ttk.Button(btnfrm, text="Start Watching", command=self.toggle_watch)
+        self.btn_watch.grid(row=0, column=5, sticky='e', padx=5)
+
+        btn_nway = ttk.Button(btnfrm, text="N-Way...", command=lambda: NWayWindow(self))
+        btn_nway.grid(row=0, column=6, sticky='e', padx=5)
+
+        self.btn_cancel = ttk.Button(btnfrm, text="Cancel", command=self.cancel_report, state='disabled')
+        self.btn_cancel.grid(row=0, column=7, sticky='e', padx=5)
+
+        self.btn_compare = ttk.Button(btnfrm, text="Compare", command=self.compare_and_save_report)
+        self.btn_compare.grid(row=0, column=8, sticky='e', padx=5)
+
+        # Add empty columns 2 and 4 that expand, pushing buttons apart and centering the middle button
+        btnfrm.columnconfigure(2, weight=1)
+        btnfrm.columnconfigure(4, weight=1)
         self.on_override_delim_change()
 
 
@@ -220,84 +307,171 @@ class HeaderCompareApp(tk.Tk):
         if not os.path.isdir(mf) or not os.path.isdir(cf):
             messagebox.showerror("Error", "Invalid folder paths!")
             return
-        self.main_files = find_files(mf)
-        self.comp_files = find_files(cf)
-        for w in self.scrollable.winfo_children():
-            w.destroy()
-        self.match_vars.clear()
-        self.delim_vars.clear()
-        self.delim_custom_vars.clear()
+        fallback = self.fallback_encoding.get().strip() or DEFAULT_FALLBACK_ENCODING
+        try:
+            codecs.lookup(fallback)
+        except LookupError:
+            messagebox.showerror("Error", f"Unknown encoding: {fallback}")
+            return
+        if fallback != self.store.fallback_encoding:
+            # Headers decoded with the previous code page have to be read again
+            self.store.fallback_encoding = fallback
+            self.store.invalidate()
+        scan = self.scan_options()
+        stats = RunStats()
+        try:
+            with timed(stats, 'scan'):
+                self.main_files = find_files(mf, *scan)
+                self.comp_files = find_files(cf, *scan)
+        except OSError as e:
+            messagebox.showerror("Error", f"Cannot scan folders: {e}")
+            return
+        self.end_edit()
+        # Split headers and column names of the previous Load are not needed any more
+        self.store.release()
+        self.tree.delete(*self.tree.get_children())
         self.rows.clear()
+        self.iid_to_file.clear()
+
+        with timed(stats, 'match'):
+            matches = match_files(self.main_files, self.comp_files)
+        stats.count('scan', len(self.main_files) + len(self.comp_files))
+        stats.count('match', len(self.main_files))
+        # Read every header of the matched pairs concurrently before building rows
+        self.store.stats = stats
+        try:
+            detections = detect_delimiters(mf, cf, matches, self.get_workers(), self.store, self.get_sample_rows())
+        finally:
+            self.store.stats = None
+        self.load_stats = self.last_stats = stats
+        for i, mfname in enumerate(self.main_files):
+            # Determine best delimiter automatically based on improved heuristic
+            auto_delim, confidence = detections[mfname]
+            delim_name = 'None' if auto_delim is None else self.delim_name_from_char(auto_delim)
+            self.add_row(mfname, str(i), matches[mfname], delim_name, confidence)
+
+    def scan_options(self):
+        return (self.recursive.get(), parse_extensions(self.extensions.get()),
+                self.split_patterns(self.include_patterns.get()), self.split_patterns(self.exclude_patterns.get()),
+                self.scan_archives.get())
+
+    def split_patterns(self, text):
+        return [p.strip() for p in text.split(';') if p.strip()]
+
+    def add_row(self, fname, iid, match, delim_name, confidence):
+        self.rows[fname] = {'iid': iid, 'match': match, 'delim': delim_name, 'custom': '', 'original': delim_name,
+                            'confidence': confidence, 'result': ''}
+        self.iid_to_file[iid] = fname
+        self.tree.insert('', 'end', iid=iid, text=fname)
+        self.refresh_row(fname)
+
+    def refresh_row(self, fname):
+        row = self.rows[fname]
+        delim_text = f"Custom ({row['custom']})" if row['delim'] == 'Custom' else row['delim']
+        # Confidence belongs to the detected delimiter; blank once the user picks another one
+        confidence = f"{row['confidence']:.0%}" if row['delim'] == row['original'] and self.override_delimiter is None else ''
+        self.tree.item(row['iid'], values=(row['match'], delim_text, confidence, self.column_counts(fname),
+                                           self.encodings(fname), row['result']))
+
+    def column_counts(self, fname):
+        # Served from the header store: switching delimiters never re-reads the files
+        delim = self.get_effective_delimiter(fname)
+        counts = []
+        for folder, name in ((self.main_folder.get(), fname), (self.comp_folder.get(), self.rows[fname]['match'])):
+            cols = self.store.columns(os.path.join(folder, name), delim)[0] if name else None
+            counts.append(str(len(cols)) if cols else '-')
+        return " / ".join(counts)
+
+    def encodings(self, fname):
+        names = []
+        for folder, name in ((self.main_folder.get(), fname), (self.comp_folder.get(), self.rows[fname]['match'])):
+            names.append((self.store.encoding(os.path.join(folder, name)) or '?') if name else '-')
+        return " / ".join(names)
+
+    def begin_edit(self, event):
+        if self.watch_thread is not None:
+            return  # the watch session owns matches and delimiters until it stops
+        iid, column = self.tree.identify_row(event.y), self.tree.identify_column(event.x)
+        if not iid or column not in ('#1', '#2'):
+            return
+        self.end_edit()
+        row = self.rows[self.iid_to_file[iid]]
+        if column == '#1':
+            self.cell_combo.configure(values=['']+self.comp_files)
+            self.cell_combo.set(row['match'])
+        else:
+            self.cell_combo.configure(values=['None', 'Custom'] + list(DELIMITERS.keys()))
+            self.cell_combo.set(row['delim'])
+        self.editing = (iid, column, self.cell_combo)
+        self.place_editor()
+        self.cell_combo.focus_set()
+
+    def place_editor(self):
+        # Keep the overlay on its cell while the tree scrolls or resizes; hide it when the row is out of view
+        if self.editing is None:
+            return
+        iid, column, widget = self.editing
+        bbox = self.tree.bbox(iid, column)
+        if bbox:
+            x, y, w, h = bbox
+            widget.place(x=x, y=y, width=w, height=h)
+        else:
+            widget.place_forget()
 
-        # Headings with Remove heading aligned above button, empty space reserved for custom delimiter entry
-        headings = ["Main File", "Match Comp File", "Delimiter", "", "Remove"]
-        for col, text in enumerate(headings):
-            ttk.Label(self.scrollable, text=text, style='Header.TLabel').grid(row=0, column=col, padx=5, pady=2)
-
-        for i, mfname in enumerate(self.main_files, start=1):
-            ttk.Label(self.scrollable, text=mfname).grid(row=i, column=0, sticky='w', padx=5)
+    def on_tree_click(self, event):
+        if self.editing and self.editing[2] is self.cell_entry:
+            self.commit_edit(self.cell_entry.get())
+        else:
+            self.end_edit()
 
-            mv = tk.StringVar()
-            lo = [f.lower() for f in self.comp_files]
-            matches = difflib.get_close_matches(mfname.lower(), lo, cutoff=0.6)
-            mv.set(self.comp_files[lo.index(matches[0])] if matches else '')
-            cb_match = ttk.Combobox(self.scrollable, values=['']+self.comp_files, textvariable=mv, state='readonly', width=40)
-            cb_match.grid(row=i, column=1, sticky='ew', padx=5)
+    def commit_edit(self, value):
+        if self.editing is None:
+            return
+        iid, column, widget = self.editing
+        fname = self.iid_to_file.get(iid)
+        if fname is None:
+            self.end_edit()
+            return
+        row = self.rows[fname]
+        if column == '#1':
+            row['match'] = value
+        elif widget is self.cell_entry:
+            row['custom'] = value
+        elif value == 'Custom':
+            # Swap the combobox for an entry to type the custom delimiter into
+            row['delim'] = value
+            self.cell_combo.place_forget()
+            self.cell_entry.delete(0, 'end')
+            self.cell_entry.insert(0, row['custom'])
+            self.editing = (iid, column, self.cell_entry)
+            self.refresh_row(fname)
+            self.place_editor()
+            self.cell_entry.focus_set()
+            return
+        else:
+            row['delim'] = value
+        self.end_edit()
+        self.refresh_row(fname)
 
-            self.match_vars[mfname] = mv
+    def end_edit(self):
+        self.editing = None
+        self.cell_combo.place_forget()
+        self.cell_entry.place_forget()
 
-            # Determine best delimiter automatically based on improved heuristic
-            auto_delim = self.auto_detect_delimiter(os.path.join(mf, mfname),
-                                                    os.path.join(cf, mv.get()) if mv.get() else None)
-
-            # Per-file delimiter combobox with Custom option + reserved space for entry
-            delim_var = tk.StringVar()
-            delim_values = ['None', 'Custom'] + list(DELIMITERS.keys())
-            delim_var.set('None' if auto_delim is None else self.delim_name_from_char(auto_delim))
-            cb_delim = ttk.Combobox(self.scrollable, values=delim_values, textvariable=delim_var, state='readonly', width=15)
-            cb_delim.grid(row=i, column=2, sticky='w', padx=5)
-
-            # Custom delimiter entry per file, hidden by default
-            custom_delim_var = tk.StringVar()
-            ent_custom = ttk.Entry(self.scrollable, textvariable=custom_delim_var, width=5)
-            ent_custom.grid(row=i, column=3, sticky='w', padx=(0, 10))
-            ent_custom.grid_remove()
-
-            # Bind to show/hide custom entry on combobox change
-            cb_delim.bind('<<ComboboxSelected>>', lambda e, v=delim_var, ent=ent_custom: self.toggle_custom_entry(v, ent))
-
-            self.delim_vars[mfname] = delim_var
-            self.delim_custom_vars[mfname] = custom_delim_var
-            self.original_delim_values[mfname] = delim_var.get()
-
-            btn_remove = ttk.Button(self.scrollable, text="Remove", command=lambda f=mfname: self.remove_file(f))
-            btn_remove.grid(row=i, column=4, sticky='e', padx=5)
-
-            self.rows[mfname] = (cb_delim, ent_custom)
-
-        # On initial load, set visibility of custom entries if default delimiter is Custom
-        for fname, delim_var in self.delim_vars.items():
-            ent = self.rows[fname][1]
-            self.toggle_custom_entry(delim_var, ent)
-
-    def toggle_custom_entry(self, delim_var, entry_widget):
-        if delim_var.get() == 'Custom':
-            entry_widget.grid()
-        else:
-            entry_widget.grid_remove()
+    def remove_selected(self):
+        if self.watch_thread is not None:
+            return  # a removed row would come back with the session's next update
+        for iid in self.tree.selection():
+            self.remove_file(self.iid_to_file[iid])
 
     def remove_file(self, fname):
-        for widget in self.scrollable.grid_slaves():
-            info = widget.grid_info()
-            if info['row'] > 0 and self.scrollable.grid_slaves(row=info['row'], column=0)[0].cget('text') == fname:
-                for w in self.scrollable.grid_slaves(row=info['row']):
-                    w.destroy()
-                break
-        self.match_vars.pop(fname, None)
-        self.delim_vars.pop(fname, None)
-        self.delim_custom_vars.pop(fname, None)
-        self.rows.pop(fname, None)
-        self.original_delim_values.pop(fname, None)
+        row = self.rows.pop(fname, None)
+        if row is None:
+            return
+        if self.editing and self.editing[0] == row['iid']:
+            self.end_edit()
+        self.iid_to_file.pop(row['iid'], None)
+        self.tree.delete(row['iid'])
 
     def apply_override_delimiter(self):
         sel = self.delimiter_name.get()
@@ -314,6 +488,8 @@ class HeaderCompareApp(tk.Tk):
         else:
             self.override_delimiter = DELIMITERS.get(sel, sel)
             self.override_custom_active = False
+        for fname in self.rows:
+            self.refresh_row(fname)
 
 
     def reset_override_delimiter(self):
@@ -321,10 +497,11 @@ class HeaderCompareApp(tk.Tk):
         self.override_custom_delim.set('')
         self.override_delimiter = None
         self.override_custom_active = False
-        # Reset all per-file delimiters to original and hide custom entry
-        for fname, delim_var in self.delim_vars.items():
-            delim_var.set(self.original_delim_values.get(fname, 'None'))
-            self.toggle_custom_entry(delim_var, self.rows[fname][1])
+        # Reset all per-file delimiters to original
+        self.end_edit()
+        for fname, row in self.rows.items():
+            row['delim'] = row['original']
+            self.refresh_row(fname)
 
     def on_override_delim_change(self, event=None):
         if self.delimiter_name.get() == 'Custom':
@@ -345,181 +522,460 @@ class HeaderCompareApp(tk.Tk):
             return None  # handled separately
         return DELIMITERS.get(delim_name, None)
 
-    def auto_detect_delimiter(self, main_file, comp_file):
-        """
-        Enhanced delimiter auto-detection:
-        For main_file and comp_file (both file paths or None), try each delimiter plus None (whitespace).
-        Pick the delimiter that results in the maximum column count intersection between the two headers.
-        Return delimiter character or None if no good delimiter found.
-        """
-        candidates = [None] + list(DELIMITERS.values())
-        best_delim = None
-        best_score = -1
-
-        # Read headers once outside loop
-        main_header_lines = []
-        comp_header_lines = []
-
-        try:
-            with open(main_file, 'r', encoding='utf-8') as f:
-                main_header_lines.append(f.readline().strip('\r\n'))
-        except:
-            return None
-        if comp_file and os.path.exists(comp_file):
-            try:
-                with open(comp_file, 'r', encoding='utf-8') as f:
-                    comp_header_lines.append(f.readline().strip('\r\n'))
-            except:
-                comp_header_lines = []
-        else:
-            comp_header_lines = []
-
-        # If comp_file not present or empty, consider only main file for scoring (number of columns)
-        for delim in candidates:
-            try:
-                if delim is None:
-                    main_cols = main_header_lines[0].split()
-                    comp_cols = comp_header_lines[0].split() if comp_header_lines else []
-                else:
-                    main_cols = main_header_lines[0].split(delim)
-                    comp_cols = comp_header_lines[0].split(delim) if comp_header_lines else []
-
-                main_cols = [clean_col_name(c) for c in main_cols]
-                comp_cols = [clean_col_name(c) for c in comp_cols]
-
-                if not main_cols or (comp_header_lines and not comp_cols):
-                    continue
-
-                # Score by intersection count or column count for main file if no comp
-                if comp_cols:
-                    score = len(set(map(str.lower, main_cols)) & set(map(str.lower, comp_cols)))
-                else:
-                    score = len(main_cols)
-
-                # Choose delimiter with highest score; tie break: more columns in main file preferred
-                if score > best_score or (score == best_score and len(main_cols) > (len(main_header_lines[0].split(best_delim)) if best_delim else 0)):
-                    best_score = score
-                    best_delim = delim
-            except Exception:
-                continue
-        return best_delim
-
     def get_effective_delimiter(self, fname):
         # Use override if applied
         if self.override_delimiter is not None:
             return self.override_delimiter
 
         # Fallback to per-file selection
-        if fname not in self.delim_vars:
+        if fname not in self.rows:
             return None
 
-        delim_name = self.delim_vars[fname].get()
+        delim_name = self.rows[fname]['delim']
         if delim_name == 'None':
             return None
         elif delim_name == 'Custom':
-            val = self.delim_custom_vars.get(fname, tk.StringVar()).get()
+            val = self.rows[fname]['custom']
             return val if val else None
         else:
             return DELIMITERS.get(delim_name, delim_name)    
 
-    def compare_headers(self, main_cols, comp_cols):
-        mc = [clean_col_name(c) for c in main_cols]
-        cc = [clean_col_name(c) for c in comp_cols]
-        ml, cl = [c.lower() for c in mc], [c.lower() for c in cc]
-
-        missing = [orig for orig, low in zip(main_cols, ml) if low not in cl]
-        extra = [orig for orig, low in zip(comp_cols, cl) if low not in ml]
-        reorder = [(main_cols[i], i+1, cl.index(low)+1) for i, low in enumerate(ml) if low in cl and i != cl.index(low)]
-        lt_issues = []
-        mlc, clc = set(), set()
-        def sp(s): return (len(s)-len(s.lstrip())), (len(s)-len(s.rstrip()))
-        for c in main_cols:
-            l, t = sp(c)
-            if l>0 or t>0:
-                lt_issues.append((c,l,t,'Main')); mlc.add(c.strip().lower())
-        for c in comp_cols:
-            l, t = sp(c)
-            if l>0 or t>0:
-                lt_issues.append((c,l,t,'Comparison')); clc.add(c.strip().lower())
-
-        case_diff = [(main_cols[i], comp_cols[cl.index(ml[i])]) for i in range(len(ml)) if ml[i] in cl and main_cols[i] != comp_cols[cl.index(ml[i])] and ml[i] not in mlc and ml[i] not in clc]
-
-        exact = len(main_cols)==len(comp_cols) and all(mc[i].lstrip('\ufeff')==cc[i].lstrip('\ufeff') for i in range(len(mc))) and not lt_issues
-        out = ["-"*80, f"Main File: {self.current_main_file}", f"Comparison File: {self.current_comp_file}", "-"*80]
-        if exact:
-            out.append("Headers match exactly.")
-        if lt_issues:
-            out.append("\nLeading/Trailing space issues:")
-            for c,l,t,o in lt_issues:
-                out.append(f" - [{o}] '{c}' Lead:{l} Trail:{t}")
-        if not exact:
-            if missing:
-                out.append("\nMissing in Comparison:")
-                out += [f" - {c}" for c in missing]
-            if extra:
-                out.append("\nExtra in Comparison:")
-                out += [f" - {c}" for c in extra]
-            if reorder:
-                out.append("\nReordered columns:")
-                out += [f" - '{c}' Main:{pm} Comp:{pc}" for c,pm,pc in reorder]
-            if case_diff:
-                out.append("\nCase differences:")
-                out += [f" - Main:'{m}' vs Comp:'{c}'" for m,c in case_diff]
-        out.append("="*80)
-        out.append("")
-        return "\n".join(out)
-
-    def generate_report(self):
-        mfld, cfl = self.main_folder.get(), self.comp_folder.get()
-        unmatched_m, unmatched_c = set(self.main_files), set(self.comp_files)
-        blocks = []
-
-        for mf in self.main_files:
-            cf = self.match_vars[mf].get()
-            if not cf:
-                continue
-            self.current_main_file, self.current_comp_file = mf, cf
-
-            delim = self.get_effective_delimiter(mf)  # <-- unified call
-
-            mp = os.path.join(mfld, mf)
-            cp = os.path.join(cfl, cf)
-            mcols, me = get_header(mp, delim)
-            ccols, ce = get_header(cp, delim)
-
-            if me or ce or not mcols or not ccols:
-                err = ["-"*80, f"Main File: {mf}", f"Comparison File: {cf}", "-"*80]
-                if me or not mcols:
-                    err.append(f"In Main: {me or 'Header missing'}")
-                if ce or not ccols:
-                    err.append(f"In Comparison: {ce or 'Header missing'}")
-                err.append("="*80)
-                err.append("")
-                blocks.append("\n".join(err))
-            else:
-                blocks.append(self.compare_headers(mcols, ccols))
-
-            unmatched_m.discard(mf)
-            unmatched_c.discard(cf)
+    def toggle_cache(self):
+        if self.use_cache.get() and self.store.cache is None:
+            try:
+                self.store.cache = HeaderCache(DEFAULT_CACHE_PATH)
+            except Exception as e:
+                self.use_cache.set(False)
+                messagebox.showerror("Error", f"Cannot open header cache: {e}")
+        elif not self.use_cache.get() and self.store.cache is not None:
+            self.close_cache()
+
+    def toggle_renames(self):
+        # Comparisons are memoized per rename setting, so switching needs no invalidation
+        self.store.rename_cutoff = DEFAULT_RENAME_CUTOFF if self.suggest_renames.get() else None
+
+    def close_cache(self):
+        cache, self.store.cache = self.store.cache, None
+        if cache is not None:
+            cache.prune()
+            cache.close()
+
+    def toggle_watch(self):
+        if self.watch_thread is not None:
+            self.watch_stop.set()
+            self.btn_watch.configure(state='disabled')
+            return
+        if not self.rows:
+            self.load_files()
+            if not self.rows:
+                return
+        mf, cf = self.main_folder.get(), self.comp_folder.get()
+        delim = 'auto' if self.override_delimiter is None else self.override_delimiter
+        session = WatchSession(mf, cf, self.scan_options(), self.store, self.get_workers(), delim,
+                               self.get_sample_rows(), self.reorder_mode.get())
+        # The session carries on from the grid: its matches, the delimiters picked by
+        # hand (rows still at their detected one keep being detected) and removed rows
+        grid = ({f: row['match'] for f, row in self.rows.items()},
+                {f: self.get_effective_delimiter(f) for f, row in self.rows.items() if row['delim'] != row['original']},
+                set(self.main_files) - set(self.rows))
+        self.watch_stop = threading.Event()
+        self.watch_thread = threading.Thread(target=self.run_watch, args=(session, grid, self.watch_stop),
+                                             daemon=True)
+        self.watch_thread.start()
+        self.btn_watch.configure(text="Stop Watching")
+        # Comparing shares the header store and its stats with the session, so it waits;
+        # rows can't be edited or removed behind the session's back either
+        self.end_edit()
+        self.btn_compare.configure(state='disabled')
+        self.btn_remove.configure(state='disabled')
+        self.btn_load.configure(state='disabled')
+        self.status_text.set("Watching for new or changed files...")
+        self.after(200, self.poll_watch)
+
+    def run_watch(self, session, grid, stop):
+        # Worker thread: polls the folders and queues (updates, removed, detections, comp files) for poll_watch(),
+        # or a status line while a folder cannot be listed (it is retried every interval)
+        try:
+            session.start(*grid)
+            problem = ''
+            while not stop.wait(DEFAULT_INTERVAL):
+                updates, removed = session.poll()
+                if "; ".join(session.errors()) != problem:
+                    problem = "; ".join(session.errors())
+                    self.watch_queue.put(f"Watching - cannot list {problem}, retrying..." if problem
+                                         else "Watching for new or changed files...")
+                if updates or removed:
+                    found = {m: session.detections.get(m) for m, _, _, _ in updates}
+                    self.watch_queue.put((updates, removed, found, session.comp_files()))
+        except Exception as e:
+            self.watch_queue.put(e)
 
-        if unmatched_m:
-            blocks.append("="*80 + "\nUnmatched Main Files:\n" + "\n".join(f" - {f}" for f in sorted(unmatched_m)) + "\n" + "="*80 + "\n")
-        if unmatched_c:
-            blocks.append("="*80 + "\nUnmatched Comparison Files:\n" + "\n".join(f" - {f}" for f in sorted(unmatched_c)) + "\n" + "="*80 + "\n")
+    def poll_watch(self):
+        try:
+            while True:
+                item = self.watch_queue.get_nowait()
+                if isinstance(item, Exception):
+                    self.watch_stop.set()
+                    messagebox.showerror("Error", f"Watching stopped: {item}")
+                    continue
+                if isinstance(item, str):
+                    self.status_text.set(item)
+                    continue
+                self.apply_watch_updates(*item)
+        except queue.Empty:
+            pass
+        if self.watch_thread.is_alive():
+            self.after(200, self.poll_watch)
+            return
+        self.watch_thread = None
+        self.btn_watch.configure(text="Start Watching", state='normal')
+        self.btn_compare.configure(state='normal')
+        self.btn_remove.configure(state='normal')
+        self.btn_load.configure(state='normal')
+        self.status_text.set("")
+
+    def apply_watch_updates(self, updates, removed, detections, comp_files):
+        self.comp_files = comp_files
+        for fname in removed:
+            self.remove_file(fname)
+            if fname in self.main_files:
+                self.main_files.remove(fname)
+        now = time.strftime('%H:%M:%S')
+        for fname, match, _, differs in updates:
+            found = detections.get(fname)
+            if fname not in self.rows:
+                self.main_files.append(fname)
+                self.watch_added += 1
+                iid = f"w{self.watch_added}"
+                delim_name = 'None' if found is None or found.delimiter is None else self.delim_name_from_char(found.delimiter)
+                self.add_row(fname, iid, match, delim_name, found.confidence if found else 0.0)
+            row = self.rows[fname]
+            row['match'] = match
+            # Rows whose delimiter was changed by hand keep it
+            if found is not None and row['delim'] == row['original']:
+                row['delim'] = row['original'] = ('None' if found.delimiter is None
+                                                  else self.delim_name_from_char(found.delimiter))
+                row['confidence'] = found.confidence
+            row['result'] = f"{'DIFF' if differs else 'match'} {now}" if match else f"unmatched {now}"
+            self.refresh_row(fname)
+        self.status_text.set(f"Watching - last change {now}: {len(updates)} pair(s) re-compared, "
+                             f"{len(removed)} file(s) removed")
+
+    def on_close(self):
+        try:
+            self.watch_stop.set()
+            if self.worker is not None:
+                self.cancel_event.set()
+                self.worker.join(timeout=10)
+            self.close_cache()
+        finally:
+            self.destroy()
+
+    def get_sample_rows(self):
+        try:
+            return max(0, int(self.sample_rows.get()))
+        except (tk.TclError, ValueError):
+            return 0
 
-        return "\n".join(blocks)
+    def get_workers(self):
+        try:
+            return max(1, int(self.workers.get()))
+        except (tk.TclError, ValueError):
+            return DEFAULT_WORKERS
+
+    def report_blocks(self, progress=None, manifest=None):
+        # Snapshot the grid on the main thread; the returned generator runs in the worker
+        # Removed rows are dropped from the run entirely
+        main_files = [mf for mf in self.main_files if mf in self.rows]
+        matches = {mf: self.rows[mf]['match'] for mf in main_files}
+        delimiters = {mf: self.get_effective_delimiter(mf) for mf in main_files}
+        total = sum(1 for mf in main_files if matches[mf])
+        blocks = iter_report(self.main_folder.get(), self.comp_folder.get(), main_files, self.comp_files,
+                             matches, delimiters, self.get_workers(), self.store, self.reorder_mode.get(),
+                             progress, self.group_results.get(), manifest)
+        return blocks, total
 
     def compare_and_save_report(self):
+        if self.worker is not None:
+            return
         if not self.main_folder.get() or not self.comp_folder.get() or not self.report_file.get():
             messagebox.showwarning("Warning","Please select folders and report path.")
             return
+        self.end_edit()
         try:
-            rpt = self.generate_report()
-            with open(self.report_file.get(), 'w', encoding='utf-8') as f:
-                f.write(rpt)
-            messagebox.showinfo("Success","Report saved successfully.")
+            out = open(self.report_file.get(), 'w', encoding='utf-8')
         except Exception as e:
             messagebox.showerror("Error", f"Failed saving report: {e}")
+            return
+        # The manifest lives next to the report, so each report path keeps its own history
+        manifest = (RunManifest(self.report_file.get() + MANIFEST_SUFFIX, self.main_folder.get(), self.comp_folder.get())
+                    if self.incremental.get() else None)
+        # The Compare run's stats continue those of the Load it is based on
+        stats = self.load_stats.copy() if self.load_stats is not None else RunStats()
+        self.store.stats = stats
+        state = self.run_state = {'done': 0, 'total': 0, 'result': None, 'error': None, 'manifest': manifest,
+                                  'stats': stats, 'stats_path': self.report_file.get() + STATS_SUFFIX
+                                  if self.save_stats.get() else None}
+        blocks, state['total'] = self.report_blocks(lambda done, total: state.update(done=done), manifest)
+        self.cancel_event = threading.Event()
+        self.run_started = time.monotonic()
+        self.set_running(True)
+        self.worker = threading.Thread(target=self.run_report, args=(out, blocks, state, self.cancel_event), daemon=True)
+        self.worker.start()
+        self.after(100, self.poll_report)
+
+    def run_report(self, out, blocks, state, cancel):
+        # Worker thread: never touches Tk, only the shared state dict polled by poll_report()
+        try:
+            stats = state['stats']
+            with timed(stats, 'report'):
+                state['result'] = write_report(out, blocks, cancel)
+            stats.count('report', state['result'][0])
+            if state['manifest'] is not None:
+                state['manifest'].save(complete=not state['result'][2])
+            if state['stats_path'] is not None and not state['result'][2]:
+                out.write("\n" + stats.format_footer(RULE))
+                stats.save(state['stats_path'])
+        except Exception as e:
+            state['error'] = e
+        finally:
+            out.close()
+
+    def show_run_stats(self):
+        if self.last_stats is None:
+            messagebox.showinfo("Last Run Stats", "Load or compare files first.")
+            return
+        popup = tk.Toplevel(self)
+        popup.title("Last Run Stats")
+        text = tk.Text(popup, width=100, height=24, wrap='none', font=("Consolas", 10))
+        text.insert('1.0', "\n".join(self.last_stats.lines()))
+        text.configure(state='disabled')
+        text.pack(padx=10, pady=10, fill='both', expand=True)
+        ttk.Button(popup, text="Close", command=popup.destroy).pack(pady=(0, 10))
+
+    def cancel_report(self):
+        self.cancel_event.set()
+        self.btn_cancel.configure(state='disabled')
+
+    def set_running(self, running):
+        self.btn_compare.configure(state='disabled' if running else 'normal')
+        self.btn_load.configure(state='disabled' if running else 'normal')
+        self.btn_watch.configure(state='disabled' if running else 'normal')
+        self.btn_cancel.configure(state='normal' if running else 'disabled')
+
+    def poll_report(self):
+        state = self.run_state
+        elapsed = time.monotonic() - self.run_started
+        total = state['total']
+        self.progress.configure(maximum=max(total, 1), value=state['done'])
+        status = f"{state['done']} / {total} pairs compared - {int(elapsed // 60):02d}:{int(elapsed % 60):02d} elapsed"
+        self.status_text.set(status + (" - cancelling..." if self.cancel_event.is_set() else ""))
+        if self.worker is not None and self.worker.is_alive():
+            self.after(100, self.poll_report)
+            return
+        self.worker = None
+        self.set_running(False)
+        self.store.stats = None
+        self.last_stats = state['stats']
+        if state['error'] is not None:
+            messagebox.showerror("Error", f"Failed saving report: {state['error']}")
+        elif state['result'] and state['result'][2]:
+            messagebox.showinfo("Cancelled", "Comparison cancelled. The partial report was saved.")
+        elif state['manifest'] is not None:
+            messagebox.showinfo("Success", f"Report saved successfully.\n"
+                                           f"{state['manifest'].reused} unchanged pair(s) reused from the last run.")
+        else:
+            messagebox.showinfo("Success","Report saved successfully.")
+
+class NWayWindow(tk.Toplevel):
+    """
+    Checks several folders against one reference (a folder or a saved schema file)
+    and shows the drift matrix: one row per reference file, one column per folder.
+    The reference is indexed once per run; the check runs in a background thread.
+    """
+    def __init__(self, app):
+        super().__init__(app)
+        self.app = app
+        self.title("N-Way Comparison")
+        self.geometry("1000x650")
+        self.reference = tk.StringVar()
+        self.status_text = tk.StringVar(value='')
+        self.index = None
+        self.results = []
+        self.worker = None
+        self.run_state = {}
+
+        top = ttk.Frame(self)
+        top.pack(padx=10, pady=10, fill='x')
+        ttk.Label(top, text="Reference:").grid(row=0, column=0, sticky='w')
+        ttk.Entry(top, textvariable=self.reference, width=70).grid(row=0, column=1, sticky='ew', padx=5)
+        ttk.Button(top, text="Folder", command=self.browse_reference_folder).grid(row=0, column=2)
+        ttk.Button(top, text="Schema File", command=self.browse_reference_schema).grid(row=0, column=3, padx=(5, 0))
+        ttk.Label(top, text="Folders:").grid(row=1, column=0, sticky='nw', pady=(5, 0))
+        self.folder_list = tk.Listbox(top, height=5, selectmode='extended')
+        self.folder_list.grid(row=1, column=1, sticky='ew', padx=5, pady=(5, 0))
+        list_btns = ttk.Frame(top)
+        list_btns.grid(row=1, column=2, columnspan=2, sticky='nw', pady=(5, 0))
+        ttk.Button(list_btns, text="Add Folder", command=self.add_folder).pack(fill='x')
+        ttk.Button(list_btns, text="Remove", command=self.remove_folders).pack(fill='x', pady=(5, 0))
+        top.columnconfigure(1, weight=1)
+
+        panes = ttk.PanedWindow(self, orient='vertical')
+        panes.pack(padx=10, fill='both', expand=True)
+        grid_frame = ttk.Frame(panes)
+        self.matrix = ttk.Treeview(grid_frame, show='tree headings', selectmode='browse')
+        sb = ttk.Scrollbar(grid_frame, orient='vertical', command=self.matrix.yview)
+        self.matrix.configure(yscrollcommand=sb.set)
+        self.matrix.pack(side='left', fill='both', expand=True)
+        sb.pack(side='right', fill='y')
+        self.matrix.tag_configure('drift', background='#fde2e1')
+        self.matrix.bind('<<TreeviewSelect>>', self.show_details)
+        self.details = tk.Text(panes, height=12, wrap='none', font=("Consolas", 9))
+        panes.add(grid_frame, weight=3)
+        panes.add(self.details, weight=1)
+
+        bottom = ttk.Frame(self)
+        bottom.pack(padx=10, pady=10, fill='x')
+        ttk.Label(bottom, textvariable=self.status_text).pack(side='left')
+        self.btn_run = ttk.Button(bottom, text="Run", command=self.run_check)
+        self.btn_run.pack(side='right', padx=5)
+        ttk.Button(bottom, text="Save Report", command=self.save_report).pack(side='right', padx=5)
+        ttk.Button(bottom, text="Save Schema", command=self.save_schema).pack(side='right', padx=5)
+
+        if app.main_folder.get():
+            self.reference.set(app.main_folder.get())
+        if app.comp_folder.get():
+            self.folder_list.insert('end', app.comp_folder.get())
+
+    def browse_reference_folder(self):
+        fld = filedialog.askdirectory(parent=self)
+        if fld:
+            self.reference.set(fld)
+
+    def browse_reference_schema(self):
+        fn = filedialog.askopenfilename(parent=self, filetypes=[("Schema", "*.json"), ("All", "*.*")])
+        if fn:
+            self.reference.set(fn)
+
+    def add_folder(self):
+        fld = filedialog.askdirectory(parent=self)
+        if fld and fld not in self.folder_list.get(0, 'end'):
+            self.folder_list.insert('end', fld)
+
+    def remove_folders(self):
+        for i in reversed(self.folder_list.curselection()):
+            self.folder_list.delete(i)
+
+    def run_check(self):
+        if self.worker is not None:
+            return
+        ref, folders = self.reference.get(), list(self.folder_list.get(0, 'end'))
+        if not (os.path.isdir(ref) or os.path.isfile(ref)) or not folders or not all(os.path.isdir(f) for f in folders):
+            messagebox.showerror("Error", "Select a reference folder or schema file and at least one folder.", parent=self)
+            return
+        app = self.app
+        # Own store: the main window may be running a comparison on its store at the same time
+        store = HeaderStore(app.get_workers(), app.store.cache, fallback_encoding=app.store.fallback_encoding,
+                            rename_cutoff=app.store.rename_cutoff)
+        delim = 'auto' if app.override_delimiter is None else app.override_delimiter
+        args = (ref, folders, store, app.get_workers(), app.scan_options(), delim, app.get_sample_rows(),
+                app.reorder_mode.get())
+        self.run_state = {'index': None, 'results': [], 'error': None}
+        self.btn_run.configure(state='disabled')
+        self.status_text.set("Indexing reference...")
+        self.worker = threading.Thread(target=self.check_folders, args=args + (self.run_state,), daemon=True)
+        self.worker.start()
+        self.after(100, self.poll_check)
+
+    def check_folders(self, ref, folders, store, workers, scan, delim, sample_rows, reorder_mode, state):
+        # Worker thread: only fills state, polled by poll_check()
+        try:
+            if os.path.isfile(ref):
+                index = SchemaIndex.load(ref)
+            else:
+                index = SchemaIndex.from_folder(ref, store, workers, scan, delim, sample_rows)
+            state['index'] = index
+            for folder, label in zip(folders, folder_labels(folders)):
+                state['results'].append(index.check(folder, store, workers, scan, reorder_mode, label=label))
+        except Exception as e:
+            state['error'] = e
+
+    def poll_check(self):
+        if not self.winfo_exists():
+            return
+        state = self.run_state
+        if state['index'] is not None:
+            self.status_text.set(f"{len(state['results'])} / {self.folder_list.size()} folders checked")
+        if self.worker.is_alive():
+            self.after(100, self.poll_check)
+            return
+        self.worker = None
+        self.btn_run.configure(state='normal')
+        if state['error'] is not None:
+            self.status_text.set('')
+            messagebox.showerror("Error", f"N-way comparison failed: {state['error']}", parent=self)
+            return
+        self.index, self.results = state['index'], state['results']
+        self.show_matrix()
+
+    def show_matrix(self):
+        labels = [r.label for r in self.results]
+        self.matrix.delete(*self.matrix.get_children())
+        self.matrix.configure(columns=[str(i) for i in range(len(labels))])
+        self.matrix.heading('#0', text="Reference File", anchor='w')
+        self.matrix.column('#0', width=320)
+        for i, label in enumerate(labels):
+            self.matrix.heading(str(i), text=label, anchor='w')
+            self.matrix.column(str(i), width=110, stretch=False)
+        drifting = 0
+        for n, name in enumerate(self.index.entries):
+            states = [r.cells[name].state for r in self.results]
+            drift = any(st != CELL_MATCH for st in states)
+            drifting += drift
+            self.matrix.insert('', 'end', iid=str(n), text=name, values=states, tags=('drift',) if drift else ())
+        extra = sum(len(r.extra) for r in self.results)
+        self.status_text.set(f"{len(self.index.entries)} reference files, {drifting} drifting, "
+                             f"{extra} file(s) not in the reference")
+        self.details.delete('1.0', 'end')
+
+    def show_details(self, event=None):
+        sel = self.matrix.selection()
+        if not sel:
+            return
+        name = self.matrix.item(sel[0], 'text')
+        text = []
+        for r in self.results:
+            cell = r.cells[name]
+            text.append(cell.block if cell.block else f"{r.label}: no matching file\n")
+        self.details.delete('1.0', 'end')
+        self.details.insert('1.0', "\n".join(text))
+
+    def save_report(self):
+        if self.index is None:
+            messagebox.showwarning("Warning", "Run the comparison first.", parent=self)
+            return
+        fn = filedialog.asksaveasfilename(parent=self, defaultextension='.txt', filetypes=[("Text", "*.txt"), ("All", "*.*")])
+        if not fn:
+            return
+        try:
+            with open(fn, 'w', encoding='utf-8') as out:
+                write_report(out, iter_nway_report(self.index, self.results))
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed saving report: {e}", parent=self)
+            return
+        messagebox.showinfo("Success", "Report saved successfully.", parent=self)
+
+    def save_schema(self):
+        if self.index is None:
+            messagebox.showwarning("Warning", "Run the comparison first.", parent=self)
+            return
+        fn = filedialog.asksaveasfilename(parent=self, defaultextension='.json', filetypes=[("Schema", "*.json")])
+        if not fn:
+            return
+        try:
+            self.index.save(fn)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed saving schema: {e}", parent=self)
 
 if __name__ == "__main__":
     app = HeaderCompareApp()
@@ -0,0 +1,100 @@
+"""Streaming access to compressed files and archive members, addressed as 'bundle.zip!/member.csv'."""
+import bz2
+import gzip
+import lzma
+import os
+import tarfile
+import zipfile
+from contextlib import contextmanager
+
+# Separates an archive path from the member inside it
+ARCHIVE_SEP = '!/'
+
+COMPRESSED = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+ZIP_EXTENSIONS = ('.zip',)
+TAR_EXTENSIONS = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+def split_member(path):
+    """'a/b.zip!/x.csv' -> ('a/b.zip', 'x.csv'); plain paths -> (path, None)."""
+    archive, sep, member = path.partition(ARCHIVE_SEP)
+    return (archive, member) if sep else (path, None)
+
+def container_path(path):
+    """The file on disk that holds path (the archive for members)."""
+    return split_member(path)[0]
+
+def is_archive(name):
+    return name.lower().endswith(ZIP_EXTENSIONS + TAR_EXTENSIONS)
+
+def is_zip(name):
+    return name.lower().endswith(ZIP_EXTENSIONS)
+
+def is_tar(name):
+    return name.lower().endswith(TAR_EXTENSIONS)
+
+def strip_compression(name):
+    """'x.csv.gz' -> 'x.csv'; archives and plain names are returned unchanged."""
+    root, ext = os.path.splitext(name)
+    return root if ext.lower() in COMPRESSED and not is_archive(name) else name
+
+def list_members(path):
+    """
+    Regular file members of the zip or tar archive at path. Zip members come from the
+    central directory; tar archives are read as a stream, so a compressed tar is
+    decompressed once but nothing is extracted.
+    """
+    if is_zip(path):
+        with zipfile.ZipFile(path) as zf:
+            return [i.filename for i in zf.infolist() if not i.is_dir()]
+    with tarfile.open(path, 'r|*') as tf:
+        return [m.name for m in tf if m.isfile()]
+
+def iter_tar_members(archive, members):
+    """
+    Yield (member, binary file) for each wanted regular file of a tar archive in
+    archive order, streaming it once; the file is only valid until the next item.
+    Stops as soon as every wanted member was seen.
+    """
+    wanted = set(members)
+    with tarfile.open(archive, 'r|*') as tf:
+        for info in tf:
+            if info.name in wanted and info.isfile():
+                wanted.discard(info.name)
+                with tf.extractfile(info) as f:
+                    yield info.name, f
+                if not wanted:
+                    return
+
+@contextmanager
+def zip_members(archive):
+    """
+    Yield open_member(member) -> binary file for a zip archive whose central
+    directory is parsed once, however many members are opened.
+    """
+    with zipfile.ZipFile(archive) as zf:
+        yield zf.open
+
+@contextmanager
+def open_binary(path):
+    """
+    Open path for binary reading, decompressing on the fly. Archive members are
+    streamed out of the archive: reading the first bytes of a zip member inflates
+    only those bytes; a tar member is reached by streaming past the members before it.
+    """
+    archive, member = split_member(path)
+    if member is None:
+        opener = COMPRESSED.get(os.path.splitext(path)[1].lower())
+        with (opener if opener and not is_archive(path) else open)(path, 'rb') as f:
+            yield f
+        return
+    if is_zip(archive):
+        with zipfile.ZipFile(archive) as zf, zf.open(member) as f:
+            yield f
+        return
+    with tarfile.open(archive, 'r|*') as tf:
+        for info in tf:
+            if info.name == member and info.isfile():
+                with tf.extractfile(info) as f:
+                    yield f
+                return
+    raise FileNotFoundError(f"No member {member} in {archive}")
@@ -0,0 +1,45 @@
+"""Renamed-column suggestions: pair missing with extra columns by name similarity, blocked by n-grams."""
+from difflib import SequenceMatcher
+
+from compact_header import clean_col_name
+from file_matcher import GramIndex, ratio_reaching, unify_separators
+
+DEFAULT_RENAME_CUTOFF = 0.6
+# Extra columns scored with SequenceMatcher per missing column (best n-gram overlap first)
+RENAME_CANDIDATES = 5
+
+def rename_key(name):
+    """'Customer-ID ' -> 'customer_id': lowercase, separators unified."""
+    return unify_separators(clean_col_name(name).lower())
+
+def pair_renames(missing, extra, cutoff=DEFAULT_RENAME_CUTOFF):
+    """
+    Suggest renames between the missing and extra column names. The extra names are
+    indexed by n-gram once (file_matcher.GramIndex), so hundreds of differing
+    columns on each side stay cheap. Pairs reaching cutoff are taken best score
+    first, one-to-one. Returns [(missing index, extra index, score)] in missing order.
+    """
+    if not missing or not extra:
+        return []
+    keys = [rename_key(n) for n in extra]
+    index = GramIndex(keys)
+    sm = SequenceMatcher(autojunk=False)
+    scored = []
+    for i, name in enumerate(missing):
+        key = rename_key(name)
+        sm.set_seq2(key)
+        for idx in index.ranked(key, RENAME_CANDIDATES):
+            sm.set_seq1(keys[idx])
+            score = ratio_reaching(sm, cutoff)
+            if score is not None:
+                scored.append((-score, i, idx))
+    scored.sort()
+    used_missing, used_extra, out = set(), set(), []
+    for score, i, idx in scored:
+        if i in used_missing or idx in used_extra:
+            continue
+        used_missing.add(i)
+        used_extra.add(idx)
+        out.append((i, idx, -score))
+    out.sort()
+    return out
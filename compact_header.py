@@ -0,0 +1,92 @@
+"""Compact split headers: interned column names, shared normalized forms and integer id arrays."""
+import sys
+import threading
+from array import array
+from operator import itemgetter
+
+_name, _clean, _key = itemgetter(0), itemgetter(1), itemgetter(2)
+
+def clean_col_name(col):
+    if col.startswith('\ufeff'):
+        col = col[1:]
+    return col.strip()
+
+def _padding(name):
+    return len(name) - len(name.lstrip()), len(name) - len(name.rstrip())
+
+class NameTable:
+    """
+    Every distinct raw column name is cleaned and lowercased once per table;
+    headers then hold small integer ids of those forms instead of their own string
+    copies. Ids are only comparable between headers of the same table.
+    """
+    def __init__(self):
+        self.forms = {}  # raw name -> (interned raw name, cleaned id, normalized id)
+        self.ids = {}  # cleaned or normalized name -> id
+        self.padded = set()  # raw names with leading or trailing whitespace
+        self.lock = threading.Lock()
+
+    def _id(self, text):
+        found = self.ids.get(text)
+        if found is None:
+            found = self.ids[text] = len(self.ids)
+        return found
+
+    def form(self, name):
+        form = self.forms.get(name)
+        if form is None:
+            with self.lock:
+                form = self.forms.get(name)
+                if form is None:
+                    clean = clean_col_name(name)
+                    form = self.forms[name] = (sys.intern(name), self._id(clean), self._id(clean.lower()))
+                    if name[:1].isspace() or name[-1:].isspace():
+                        self.padded.add(form[0])
+        return form
+
+_table = NameTable()
+
+def release_names():
+    """
+    Start a new table for headers built from now on, so names no longer in use can
+    be freed. Headers built before keep (and keep alive) the table they were built with.
+    """
+    global _table
+    _table = NameTable()
+
+class CompactHeader:
+    """
+    A split header as the comparison needs it: names (the raw columns, interned, so
+    the same name in many headers is one string), clean (ids of the BOM-less,
+    stripped names), keys (ids of their lowercase forms, used for pairing) and
+    padded ((index, leading, trailing) of the few columns with surrounding spaces).
+    Equal ids mean equal forms within one NameTable (table), so comparing two
+    headers of the same table never builds new strings.
+    Behaves as a read-only sequence of the raw names.
+    """
+    __slots__ = ('names', 'clean', 'keys', 'padded', 'table')
+
+    def __init__(self, columns, table=None):
+        self.table = table = table or _table
+        forms, form = table.forms, table.form
+        rows = [forms.get(c) or form(c) for c in columns]
+        self.names = tuple(map(_name, rows))
+        self.clean = array('i', map(_clean, rows))
+        self.keys = array('i', map(_key, rows))
+        self.padded = (() if table.padded.isdisjoint(self.names) else
+                       tuple((i, *_padding(c)) for i, c in enumerate(self.names) if c in table.padded))
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __getitem__(self, index):
+        return self.names[index]
+
+def compact(columns, table=None):
+    """columns as a CompactHeader of table (returned unchanged if it already is one of that table)."""
+    if isinstance(columns, CompactHeader) and (table is None or columns.table is table):
+        return columns
+    return CompactHeader(columns, table)
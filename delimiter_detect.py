@@ -0,0 +1,167 @@
+"""Single-pass, quote-aware delimiter detection with a confidence score."""
+from collections import namedtuple
+
+QUOTE = '"'
+
+# Result of a detection; delimiter None means "split on whitespace"
+Detection = namedtuple('Detection', 'delimiter confidence')
+
+def count_delimiters(line, candidates, quote=QUOTE):
+    """
+    Count every candidate delimiter outside quoted fields in one pass over line.
+    Multi-character candidates win over their prefixes ('::' is not also two ':').
+    Whitespace-separated gaps are counted under the key None. Returns {candidate: count}.
+    Lines without a quote are counted with str.count; only quoted lines are walked
+    character by character.
+    """
+    if quote not in line:
+        return _count_unquoted(line, candidates)
+    by_first = {}
+    for c in sorted({c for c in candidates if c}, key=len, reverse=True):
+        by_first.setdefault(c[0], []).append(c)
+    counts = dict.fromkeys(candidates, 0)
+    in_quotes, prev_space, field_start = False, True, True
+    tokens = 0
+    i, n = 0, len(line)
+    while i < n:
+        ch = line[i]
+        if in_quotes:
+            if ch == quote:
+                if i + 1 < n and line[i + 1] == quote:
+                    i += 2  # escaped quote
+                    continue
+                in_quotes = False
+            i += 1
+            continue
+        if ch.isspace():
+            prev_space = True
+        elif prev_space:
+            tokens += 1
+            prev_space = False
+        matched = None
+        for c in by_first.get(ch, ()):
+            if line.startswith(c, i):
+                matched = c
+                break
+        if matched:
+            counts[matched] += 1
+            field_start = True
+            i += len(matched)
+            continue
+        if ch == quote and field_start:
+            in_quotes = True
+        if not ch.isspace():
+            field_start = False
+        i += 1
+    counts[None] = max(tokens - 1, 0)
+    return counts
+
+def _count_unquoted(line, candidates):
+    counts = dict.fromkeys(candidates, 0)
+    rest = line
+    for c in sorted({c for c in candidates if c}, key=len, reverse=True):
+        n = counts[c] = rest.count(c)
+        if n and len(c) > 1:
+            rest = rest.replace(c, '\0')  # '::' hits are not also counted as ':'
+    counts[None] = max(len(line.split()) - 1, 0)
+    return counts
+
+def split_quoted(line, delimiter, quote=QUOTE):
+    """
+    Split line on delimiter, keeping delimiters inside quoted fields. Quotes that
+    wrap a whole field are removed and doubled quotes inside it are unescaped.
+    delimiter None splits on whitespace like str.split(); an empty delimiter raises
+    ValueError like str.split('').
+    """
+    if delimiter == '':
+        raise ValueError("empty separator")
+    if quote not in line:
+        return line.split() if delimiter is None else line.split(delimiter)
+    fields, buf = [], []
+    quoted = in_quotes = False
+    i, n = 0, len(line)
+    while i < n:
+        ch = line[i]
+        if in_quotes:
+            if ch == quote:
+                if i + 1 < n and line[i + 1] == quote:
+                    buf.append(quote)
+                    i += 2
+                    continue
+                in_quotes = False
+            else:
+                buf.append(ch)
+            i += 1
+            continue
+        if ch == quote and not ''.join(buf).strip():
+            in_quotes = quoted = True
+            buf = [] if delimiter is None else buf
+            i += 1
+            continue
+        if delimiter is None and ch.isspace():
+            if buf or quoted:
+                fields.append(''.join(buf))
+            buf, quoted = [], False
+            i += 1
+            continue
+        if delimiter is not None and line.startswith(delimiter, i):
+            fields.append(''.join(buf))
+            buf, quoted = [], False
+            i += len(delimiter)
+            continue
+        buf.append(ch)
+        i += 1
+    if delimiter is not None or buf or quoted:
+        fields.append(''.join(buf))
+    return fields
+
+def _field_names(line, delimiter, quote):
+    return [c.lstrip('\ufeff').strip().lower() for c in split_quoted(line, delimiter, quote)]
+
+def detect(main_line, comp_line=None, candidates=(), sample_rows=(), quote=QUOTE):
+    """
+    Pick the delimiter for main_line. Counting is a single pass per line; only the
+    candidates that actually occur are split and scored. With comp_line the score is
+    the number of column names both headers share (as before); otherwise it is the
+    number of non-empty columns. sample_rows (data lines) confirm that the column
+    count stays consistent. Whitespace splitting is only considered when no
+    non-blank delimiter occurs. Returns Detection(delimiter, confidence 0..1).
+    """
+    if main_line is None:
+        return Detection(None, 0.0)
+    candidates = list(dict.fromkeys(candidates))
+    counts = count_delimiters(main_line, candidates, quote)
+    present = [c for c in candidates if counts.get(c)]
+    explicit = [c for c in present if c != ' ']
+    if explicit:
+        present = explicit
+    elif counts[None]:
+        present.append(None)  # whitespace last: explicit delimiters win ties
+    if not present:
+        return Detection(None, 0.5 if len(split_quoted(main_line, None, quote)) == 1 else 0.3)
+
+    samples = [count_delimiters(row, candidates, quote) for row in sample_rows if row]
+    scored = []
+    for order, delim in enumerate(present):
+        names = _field_names(main_line, delim, quote)
+        non_empty = sum(1 for c in names if c)
+        if comp_line:
+            overlap = len(set(names) & set(_field_names(comp_line, delim, quote)) - {''})
+            score = overlap
+        else:
+            overlap = None
+            score = non_empty
+        consistency = (sum(1 for row in samples if row.get(delim, 0) == counts[delim]) / len(samples)
+                       if samples else 1.0)
+        scored.append((score * consistency, consistency, non_empty - len(names), -order,
+                       delim, len(names), overlap))
+    scored.sort(key=lambda t: t[:4], reverse=True)
+    best = scored[0]
+    score, consistency, _, _, delim, ncols, overlap = best
+    runner_up = scored[1][0] if len(scored) > 1 else 0
+    confidence = 0.5 + 0.5 * ((score - runner_up) / score if score > 0 else 0)
+    if overlap is not None:
+        confidence *= 0.5 + 0.5 * (overlap / max(ncols, 1))
+    if samples:
+        confidence *= consistency
+    return Detection(delim, round(confidence, 2))
@@ -0,0 +1,162 @@
+"""Indexed main -> comparison file matching: exact names, normalized names, then n-gram fuzzy candidates."""
+import os
+import re
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+from archive_io import ARCHIVE_SEP
+
+DEFAULT_CUTOFF = 0.6
+# Fuzzy candidates scored with SequenceMatcher per main file (best n-gram overlap first)
+MAX_CANDIDATES = 6
+# n-grams shared by more indexed keys than this are too common to pick candidates with
+MAX_POSTING = 64
+MIN_GRAMS = 3
+
+# Match priority: exact (case-insensitive) name, then same normalized name, then fuzzy ratio
+EXACT_SCORE = 3.0
+NORMALIZED_SCORE = 1.0
+
+_DATE_RE = re.compile(r'(?:19|20)\d{2}[-_.]?(?:0[1-9]|1[0-2])[-_.]?(?:0[1-9]|[12]\d|3[01])(?:[-_T]?\d{4,6})?')
+_STAMP_RE = re.compile(r'\d{6,}')
+_SEP_RE = re.compile(r'[\s_.\-]+')
+
+def strip_extensions(name):
+    """'a.csv.gz' -> 'a'; numeric suffixes such as '.001' are kept."""
+    while True:
+        root, ext = os.path.splitext(name)
+        if not ext or ext[1:].isdigit() or len(ext) > 6:
+            return name
+        name = root
+
+def unpack_name(name):
+    """'d/bundle.zip!/x.csv' -> 'd/x.csv', so archive members pair with loose or other archived files."""
+    archive, sep, member = name.rpartition(ARCHIVE_SEP)
+    if not sep:
+        return name
+    folder = archive.rpartition('/')[0]
+    return f"{folder}/{member}" if folder else member
+
+def normalize_name(name):
+    """Lower-case name without archive, extensions, dates, long digit runs and separator noise."""
+    base = strip_extensions(unpack_name(name.lower()))
+    return unify_separators(_STAMP_RE.sub('', _DATE_RE.sub('', base)))
+
+def unify_separators(text):
+    """'a - b.c_' -> 'a_b_c': runs of whitespace, '_', '.' and '-' become one '_'."""
+    return _SEP_RE.sub('_', text).strip('_')
+
+def ngrams(text, n=3):
+    padded = f" {text} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+def ratio_reaching(sm, cutoff):
+    """sm.ratio() if it reaches cutoff, else None; its cheap upper bounds are checked first."""
+    if sm.real_quick_ratio() >= cutoff and sm.quick_ratio() >= cutoff:
+        ratio = sm.ratio()
+        if ratio >= cutoff:
+            return ratio
+    return None
+
+class GramIndex:
+    """
+    n-gram postings of a list of keys, so a lookup only has to score the few keys
+    sharing its rarer n-grams with SequenceMatcher instead of all of them.
+    """
+    def __init__(self, keys=()):
+        self.postings = defaultdict(list)
+        self.counts = []  # n-grams per indexed key
+        for key in keys:
+            self.add(key)
+
+    def add(self, key):
+        idx = len(self.counts)
+        grams = ngrams(key)
+        self.counts.append(len(grams))
+        for g in grams:
+            self.postings[g].append(idx)
+        return idx
+
+    def ranked(self, key, limit=None, within=None):
+        """
+        Indexes of the keys sharing the rarer n-grams of key, best Dice overlap first
+        (at most limit). within restricts the result to those indexes and keeps
+        them even when they share no n-gram.
+        """
+        grams = ngrams(key)
+        postings = sorted((self.postings[g] for g in grams if g in self.postings), key=len)
+        hits = defaultdict(int)
+        for i, posting in enumerate(postings):
+            if len(posting) > MAX_POSTING and i >= MIN_GRAMS:
+                break
+            for idx in posting:
+                hits[idx] += 1
+        if within is not None:
+            for idx in within:
+                hits.setdefault(idx, 0)
+        dice = {idx: 2 * n / (len(grams) + self.counts[idx]) for idx, n in hits.items()
+                if within is None or idx in within}
+        return sorted(dice, key=lambda idx: (-dice[idx], idx))[:limit]
+
+class FileMatcher:
+    """
+    Indexes the comparison file names once so each main file only scores a handful
+    of candidates instead of every comparison file. assign() resolves all matches
+    together, best score first, so a comparison file is claimed by one main file.
+    """
+    def __init__(self, comp_files, cutoff=DEFAULT_CUTOFF, max_candidates=MAX_CANDIDATES):
+        self.comp_files = list(comp_files)
+        self.cutoff = cutoff
+        self.max_candidates = max_candidates
+        self.lowered = [f.lower() for f in self.comp_files]
+        self.exact = defaultdict(list)
+        self.normalized = defaultdict(list)
+        self.grams = GramIndex()
+        for idx, low in enumerate(self.lowered):
+            self.exact[low].append(idx)
+            key = normalize_name(low)
+            if key:
+                self.normalized[key].append(idx)
+            self.grams.add(strip_extensions(unpack_name(low)))
+
+    def candidates(self, name):
+        """
+        Return [(score, comp index)] for name. Exact names win outright; files with
+        the same normalized name (e.g. another date of the same feed) come next and
+        bypass the cutoff; otherwise only the best n-gram candidates are scored with
+        SequenceMatcher and kept when their ratio reaches the cutoff.
+        """
+        low = name.lower()
+        if low in self.exact:
+            return [(EXACT_SCORE, idx) for idx in self.exact[low]]
+        group = self.normalized.get(normalize_name(low))
+        ranked = self.grams.ranked(strip_extensions(unpack_name(low)), self.max_candidates,
+                                   set(group) if group else None)
+        sm = SequenceMatcher()
+        sm.set_seq2(low)
+        out = []
+        for idx in ranked:
+            sm.set_seq1(self.lowered[idx])
+            if group:
+                out.append((NORMALIZED_SCORE + sm.ratio(), idx))
+            else:
+                ratio = ratio_reaching(sm, self.cutoff)
+                if ratio is not None:
+                    out.append((ratio, idx))
+        return out
+
+    def assign(self, main_files):
+        """One-to-one {main file: comparison file or ''} maximizing match quality greedily."""
+        scored = []
+        for order, name in enumerate(main_files):
+            scored += [(-score, order, idx) for score, idx in self.candidates(name)]
+        scored.sort()
+        result = dict.fromkeys(main_files, '')
+        taken = set()
+        for _, order, idx in scored:
+            name = main_files[order]
+            if result[name] or idx in taken:
+                continue
+            result[name] = self.comp_files[idx]
+            taken.add(idx)
+        return result
@@ -0,0 +1,88 @@
+"""Folder scanning with os.scandir: optional recursion, extension and glob filters, relative paths."""
+import os
+from fnmatch import fnmatch
+
+from archive_io import ARCHIVE_SEP, is_archive, list_members, strip_compression
+
+DEFAULT_EXTENSIONS = ('.txt', '.csv')
+
+def parse_extensions(text):
+    """'.tsv, dat;PSV' -> ('.tsv', '.dat', '.psv'); '' or '*' -> None (any extension)."""
+    exts = [e.strip().lower() for e in text.replace(';', ',').split(',') if e.strip()]
+    if not exts or '*' in exts:
+        return None
+    return tuple(e if e.startswith('.') else '.' + e for e in exts)
+
+def _matches(rel, name, patterns):
+    # A pattern applies to the path relative to the scanned folder or to the bare name
+    return any(fnmatch(rel, p) or fnmatch(name, p) for p in patterns)
+
+def _wanted(rel, name, extensions, include, exclude):
+    if extensions is not None and not name.lower().endswith(extensions):
+        return False
+    if include and not _matches(rel, name, include):
+        return False
+    return not (exclude and _matches(rel, name, exclude))
+
+def scan_dir(path, prefix='', recursive=False, extensions=DEFAULT_EXTENSIONS, include=(), exclude=(), archives=True,
+             members=list_members):
+    """
+    List one directory: returns (files, subdirs) where files are the wanted
+    '/'-separated relative paths (prefix + name, archive members expanded) and
+    subdirs the (prefix, path) of the subfolders to descend into (only if recursive).
+    members(archive path) lists an archive; callers listing the same directory
+    again pass one that remembers unchanged archives.
+    """
+    files, subdirs = [], []
+    with os.scandir(path) as it:
+        for entry in it:
+            rel = prefix + entry.name
+            if exclude and _matches(rel, entry.name, exclude):
+                continue
+            try:
+                if recursive and entry.is_dir(follow_symlinks=False):
+                    subdirs.append((rel + '/', entry.path))
+                    continue
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            if archives and is_archive(entry.name):
+                try:
+                    names = members(entry.path)
+                except Exception:
+                    continue  # unreadable or corrupt archive
+                for member in names:
+                    name = member.rpartition('/')[2]
+                    if _wanted(rel + ARCHIVE_SEP + member, name, extensions, include, exclude):
+                        files.append(rel + ARCHIVE_SEP + member)
+                continue
+            if _wanted(rel, strip_compression(entry.name), extensions, include, ()):  # exclude checked above
+                files.append(rel)
+    return files, subdirs
+
+def scan_folder(folder, recursive=False, extensions=DEFAULT_EXTENSIONS, include=(), exclude=(), archives=True):
+    """
+    Return the sorted '/'-separated paths, relative to folder, of the files whose
+    extension is in extensions (None = any) and that match an include pattern
+    (when given) but no exclude pattern. Directory entries come from os.scandir, so
+    no extra stat is needed per file; symlinked directories are not followed.
+    Excluded directories are not descended into. Compressed files ('x.csv.gz') are
+    filtered by their inner extension; with archives, zip/tar members are listed as
+    'bundle.zip!/member.csv' instead of the archive itself.
+    """
+    extensions = tuple(e.lower() for e in extensions) if extensions is not None else None
+    files = []
+    pending = [('', folder)]
+    while pending:
+        prefix, path = pending.pop()
+        try:
+            found, subdirs = scan_dir(path, prefix, recursive, extensions, include, exclude, archives)
+        except OSError:
+            if not prefix:
+                raise
+            continue  # unreadable subfolder
+        files += found
+        pending += subdirs
+    files.sort()
+    return files
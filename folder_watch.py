@@ -0,0 +1,158 @@
+"""Cheap polling of a folder tree: re-list only directories whose mtime changed, debounce files being written."""
+import os
+import time
+
+from archive_io import container_path, list_members
+from folder_scan import DEFAULT_EXTENSIONS, scan_dir
+
+DEFAULT_INTERVAL = 2.0
+DEFAULT_DEBOUNCE = 2.0
+# Every this many polls all directories are listed and all files stat'ed, catching in-place rewrites
+DEFAULT_FULL_EVERY = 30
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+class FolderWatcher:
+    """
+    Tracks the wanted files of folder (same filters as scan_folder()). poll() stats
+    only the known directories and re-lists those whose mtime changed, so an idle
+    tree costs one stat per directory. A new or changed file is reported only once
+    its (size, mtime) has stayed the same for debounce seconds, so files still being
+    copied in are not compared half-written. If the folder itself cannot be listed
+    (e.g. a network share drops out), poll() reports nothing, keeps its state and
+    sets error until a later poll reaches it again.
+    """
+    def __init__(self, folder, recursive=False, extensions=DEFAULT_EXTENSIONS, include=(), exclude=(), archives=True,
+                 debounce=DEFAULT_DEBOUNCE, full_every=DEFAULT_FULL_EVERY, clock=time.monotonic):
+        self.folder = folder
+        self.options = (recursive, tuple(e.lower() for e in extensions) if extensions is not None else None,
+                        include, exclude, archives)
+        self.debounce = debounce
+        self.full_every = full_every
+        self.clock = clock
+        self.dirs = {}  # prefix -> (path, mtime_ns)
+        self.dir_files = {}  # prefix -> set of relative file paths listed there
+        self.stamps = {}  # relative path -> (size, mtime_ns) last reported
+        self.pending = {}  # relative path -> (stamp, time it was first seen with that stamp)
+        self.archives = {}  # archive path -> ((size, mtime_ns), member names)
+        self.archives_seen = set()  # archives listed since the last full pass
+        self.polls = 0
+        self.error = None  # OSError of the last poll that could not list the folder itself
+
+    def files(self):
+        return sorted(self.stamps)
+
+    def prime(self):
+        """Record the current tree as the baseline without reporting anything; returns the files."""
+        self.dirs.clear()
+        self.dir_files.clear()
+        self.pending.clear()
+        self._list('', self.folder, set())
+        self.stamps = {rel: _stamp(container_path(self._path(rel))) for files in self.dir_files.values() for rel in files}
+        return self.files()
+
+    def _members(self, path):
+        # A re-listed directory only re-reads archives whose stamp changed: listing a
+        # compressed tar decompresses all of it
+        stamp = _stamp(path)
+        cached = self.archives.get(path)
+        if cached is None or stamp is None or cached[0] != stamp:
+            cached = self.archives[path] = (stamp, list_members(path))
+        self.archives_seen.add(path)
+        return cached[1]
+
+    def _path(self, rel):
+        return os.path.join(self.folder, rel)
+
+    def _list(self, prefix, path, listed):
+        """(Re-)list one directory and any new subfolders below it; returns False if it is gone."""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            found, subdirs = scan_dir(path, prefix, *self.options, members=self._members)
+        except OSError:
+            if not prefix:
+                raise
+            return False
+        self.dirs[prefix] = (path, mtime)
+        self.dir_files[prefix] = set(found)
+        listed.add(prefix)
+        for sub_prefix, sub_path in subdirs:
+            if sub_prefix not in self.dirs:
+                self._list(sub_prefix, sub_path, listed)
+        # Subfolders that disappeared take their files with them
+        for gone in [d for d in self.dirs if d.startswith(prefix) and d != prefix
+                     and d[len(prefix):].count('/') == 1 and d not in {p for p, _ in subdirs}]:
+            self._drop(gone)
+        return True
+
+    def _drop(self, prefix):
+        for d in [d for d in self.dirs if d.startswith(prefix)]:
+            del self.dirs[d]
+            self.dir_files.pop(d, None)
+
+    def poll(self):
+        """
+        Look for changes since the last poll. Returns (changed, removed): files that
+        appeared or changed and have settled, and files that are gone.
+        """
+        self.polls += 1
+        self.error = None
+        full = self.full_every and self.polls % self.full_every == 0
+        listed = set()
+        # The folder itself comes first, so failing on it leaves everything untouched
+        for prefix, (path, mtime) in list(self.dirs.items()):
+            if prefix not in self.dirs or prefix in listed:
+                continue  # dropped or re-listed along with its parent
+            try:
+                current = os.stat(path).st_mtime_ns
+                if not prefix and (full or current != mtime):
+                    self._list(prefix, path, listed)
+                    continue
+            except OSError as e:
+                if not prefix:
+                    self.error = e
+                    return [], []
+                current = None
+            if current is None:
+                self._drop(prefix)
+            elif full or current != mtime:
+                if not self._list(prefix, path, listed):
+                    self._drop(prefix)
+        if full:
+            # Every directory was listed, so archives not seen since the last full pass are gone
+            self.archives = {p: m for p, m in self.archives.items() if p in self.archives_seen}
+            self.archives_seen = set()
+        present = set().union(*self.dir_files.values()) if self.dir_files else set()
+        removed = sorted(rel for rel in self.stamps if rel not in present)
+        for rel in removed:
+            del self.stamps[rel]
+        for rel in [rel for rel in self.pending if rel not in present]:
+            del self.pending[rel]
+
+        now = self.clock()
+        # Files of re-listed directories are re-stat'ed; the rest of the tree is not touched
+        candidates = {rel for prefix in listed for rel in self.dir_files.get(prefix, ())}
+        candidates.update(self.pending)
+        changed = []
+        stat_cache = {}
+        for rel in sorted(candidates):
+            disk = container_path(self._path(rel))
+            if disk not in stat_cache:
+                stat_cache[disk] = _stamp(disk)
+            stamp = stat_cache[disk]
+            if stamp is None or stamp == self.stamps.get(rel):
+                self.pending.pop(rel, None)
+                continue
+            seen = self.pending.get(rel)
+            if (seen is None or seen[0] != stamp) and self.debounce > 0:
+                self.pending[rel] = (stamp, now)
+            elif seen is None or seen[0] != stamp or now - seen[1] >= self.debounce:
+                self.pending.pop(rel, None)
+                self.stamps[rel] = stamp
+                changed.append(rel)
+        return changed, removed
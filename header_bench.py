@@ -0,0 +1,268 @@
+"""Headless benchmark suite: synthetic main/comparison folders, per-phase timings and JSON baselines."""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import header_engine as engine
+from header_cli import DELIMITER_ALIASES, parse_delimiter
+
+BENCH_VERSION = 1
+EXIT_OK = 0
+EXIT_REGRESSION = 1
+EXIT_ERROR = 2
+
+PHASES = ('scan', 'match', 'read', 'detect', 'compare', 'report')
+DEFAULT_TOLERANCE = 0.25
+# Phases faster than this in both runs are never reported as regressions (timer noise)
+NOISE_FLOOR = 0.005
+
+_WORDS = ('id', 'name', 'date', 'amount', 'account', 'status', 'region', 'code', 'price', 'qty',
+          'customer', 'order', 'created', 'updated', 'type', 'currency', 'branch', 'total', 'flag', 'ref')
+_PREFIXES = ('orders', 'customers', 'ledger', 'positions', 'trades', 'rates', 'accounts', 'invoices')
+
+def base_columns(count, rnd):
+    """count distinct column names built from a small vocabulary, as real headers are."""
+    words = [rnd.choice(_WORDS) for _ in range(count)]
+    return [f"{w}_{i}" for i, w in enumerate(words)]
+
+def drift_columns(cols, rnd, missing=0.0, reorder=0.0, case=0.0):
+    """The comparison side of cols: each rate is the fraction of columns dropped, moved or recased."""
+    out = [c for c in cols if rnd.random() >= missing]
+    for _ in range(int(len(out) * reorder / 2)):
+        i, j = rnd.randrange(len(out)), rnd.randrange(len(out))
+        out[i], out[j] = out[j], out[i]
+    return [c.upper() if rnd.random() < case else c for c in out]
+
+def write_file(path, cols, delimiter, encoding, rows=2):
+    sep = ' ' if delimiter is None else delimiter
+    with open(path, 'w', encoding=encoding, newline='') as f:
+        f.write(sep.join(cols) + "\r\n")
+        for r in range(rows):
+            f.write(sep.join(str(r * len(cols) + i) for i in range(len(cols))) + "\r\n")
+
+def generate(folder, files, columns, delimiters=(',',), encodings=('utf-8',), missing=0.0, reorder=0.0,
+             case=0.0, renamed=0.0, seed=0):
+    """
+    Create folder/main and folder/comp with files matched pairs of columns-wide
+    headers. Delimiters and encodings are assigned round-robin; drift rates apply
+    per column, renamed is the fraction of comparison files whose name gets a date
+    stamp (exercising fuzzy matching). Returns (main folder, comparison folder).
+    """
+    rnd = random.Random(seed)
+    main, comp = os.path.join(folder, 'main'), os.path.join(folder, 'comp')
+    os.makedirs(main, exist_ok=True)
+    os.makedirs(comp, exist_ok=True)
+    for i in range(files):
+        # Hex ids: a run of 6+ digits would be stripped as a stamp by the name matcher
+        name = f"{_PREFIXES[i % len(_PREFIXES)]}_{i:05x}"
+        delim, enc = delimiters[i % len(delimiters)], encodings[i % len(encodings)]
+        cols = base_columns(columns, rnd)
+        write_file(os.path.join(main, name + '.csv'), cols, delim, enc)
+        comp_name = f"{name}_2024010{1 + i % 9}" if rnd.random() < renamed else name
+        write_file(os.path.join(comp, comp_name + '.csv'), drift_columns(cols, rnd, missing, reorder, case), delim, enc)
+    return main, comp
+
+def prepare(data_dir, params):
+    """Generate the folders of a scenario under data_dir unless an identical set is already there."""
+    folder = os.path.join(data_dir, scenario_name(params).replace(' ', '_').replace('=', '-'))
+    marker = os.path.join(folder, 'params.json')
+    stored = {**params, 'version': BENCH_VERSION}  # a new generator version regenerates
+    try:
+        with open(marker, 'r', encoding='utf-8') as f:
+            if json.load(f) == stored:
+                return os.path.join(folder, 'main'), os.path.join(folder, 'comp')
+    except (OSError, ValueError):
+        pass
+    for sub in ('main', 'comp'):
+        path = os.path.join(folder, sub)
+        if os.path.isdir(path):
+            for name in os.listdir(path):
+                os.remove(os.path.join(path, name))
+    dirs = generate(folder, **params)
+    with open(marker, 'w', encoding='utf-8') as f:
+        json.dump(stored, f)
+    return dirs
+
+def scenario_name(params):
+    return f"files={params['files']} columns={params['columns']}"
+
+def time_phases(main, comp, workers=engine.DEFAULT_WORKERS, reorder_mode=engine.REORDER_POSITION):
+    """
+    Run one comparison the way the CLI does, timing each phase with a fresh HeaderStore
+    and column name table (later repeats must not find the names already interned):
+    scan (both folders), match, read (all headers), detect (auto delimiters on the
+    loaded headers), compare (every pair) and report (formatting the full report).
+    Returns {phase: seconds}.
+    """
+    store = engine.HeaderStore(workers)
+    store.release()
+    times = {}
+    t = time.perf_counter()
+    main_files, comp_files = engine.find_files(main), engine.find_files(comp)
+    times['scan'] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    matches = engine.match_files(main_files, comp_files)
+    times['match'] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    store.prefetch([os.path.join(main, f) for f in main_files] +
+                   [os.path.join(comp, f) for f in comp_files], workers)
+    times['read'] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    detections = engine.detect_delimiters(main, comp, matches, workers, store)
+    delimiters = {m: d.delimiter for m, d in detections.items()}
+    times['detect'] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    for mf, cf in matches.items():
+        if cf:
+            store.compare(os.path.join(main, mf), os.path.join(comp, cf), delimiters[mf], reorder_mode)
+    times['compare'] = time.perf_counter() - t
+
+    # Comparisons are memoized by now, so this measures report assembly and formatting
+    t = time.perf_counter()
+    engine.generate_report(main, comp, main_files, comp_files, matches, delimiters, workers, store, reorder_mode)
+    times['report'] = time.perf_counter() - t
+    return times
+
+def run_scenario(main, comp, repeat=3, workers=engine.DEFAULT_WORKERS, reorder_mode=engine.REORDER_POSITION):
+    """Best time per phase over repeat runs (the OS file cache is warm after the first)."""
+    best = {}
+    for _ in range(max(1, repeat)):
+        for phase, secs in time_phases(main, comp, workers, reorder_mode).items():
+            best[phase] = min(secs, best.get(phase, secs))
+    return best
+
+def environment(workers):
+    return {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+            'platform': platform.platform(), 'cpus': os.cpu_count(), 'workers': workers}
+
+def compare_baseline(baseline, results, tolerance=DEFAULT_TOLERANCE):
+    """
+    Lines comparing results against a baseline run, and the number of phases that
+    got more than tolerance slower. Scenarios are paired by their parameters.
+    """
+    earlier = {json.dumps(s['params'], sort_keys=True): s for s in baseline.get('scenarios', [])}
+    lines, regressions = [], 0
+    for s in results['scenarios']:
+        old = earlier.get(json.dumps(s['params'], sort_keys=True))
+        if old is None:
+            lines.append(f"{s['name']}: not in baseline")
+            continue
+        for phase in PHASES:
+            before, now = old['phases'].get(phase), s['phases'][phase]
+            if before is None:
+                continue
+            ratio = now / before if before else float('inf')
+            slower = ratio > 1 + tolerance and max(before, now) >= NOISE_FLOOR
+            regressions += slower
+            lines.append(f"{s['name']:<28} {phase:<8} {before:10.4f}s {now:10.4f}s {ratio:7.2f}x"
+                         f"{'  SLOWER' if slower else ''}")
+    return lines, regressions
+
+def parse_counts(text):
+    return [int(v) for v in text.replace(';', ',').split(',') if v.strip()]
+
+def build_parser():
+    p = argparse.ArgumentParser(
+        prog='header_bench',
+        description="Time each phase of a folder comparison on generated data, without a display. "
+                    "Every combination of --files and --columns is one scenario. Exits with 1 when "
+                    "a phase is slower than the --baseline by more than the tolerance.")
+    p.add_argument('--files', default='10,1000', metavar='LIST', help="comma-separated file counts (default 10,1000)")
+    p.add_argument('--columns', default='10,1000', metavar='LIST',
+                   help="comma-separated columns per header (default 10,1000)")
+    p.add_argument('--delimiters', default='comma', metavar='LIST',
+                   help=f"comma-separated delimiters used round-robin: {', '.join(DELIMITER_ALIASES)} (default comma)")
+    p.add_argument('--encodings', default='utf-8', metavar='LIST',
+                   help="comma-separated encodings used round-robin, e.g. utf-8,utf-8-sig,utf-16,cp1252")
+    p.add_argument('--missing', type=float, default=0.02, help="fraction of columns missing on the comparison side")
+    p.add_argument('--reorder', type=float, default=0.02, help="fraction of columns moved on the comparison side")
+    p.add_argument('--case', type=float, default=0.02, help="fraction of columns recased on the comparison side")
+    p.add_argument('--renamed', type=float, default=0.1,
+                   help="fraction of comparison files whose name carries a date stamp")
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--data', metavar='DIR',
+                   help="where generated folders are kept and reused between runs (default: a temporary folder)")
+    p.add_argument('--repeat', type=int, default=3, help="runs per scenario; the best time per phase is kept")
+    p.add_argument('-j', '--workers', type=int, default=engine.DEFAULT_WORKERS)
+    p.add_argument('--reorder-mode', choices=engine.REORDER_MODES, default=engine.REORDER_POSITION)
+    p.add_argument('-o', '--output', metavar='PATH', help="save the results as a JSON baseline")
+    p.add_argument('--baseline', metavar='PATH', help="compare the results with an earlier JSON baseline")
+    p.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                   help=f"allowed slowdown per phase before it counts as a regression (default {DEFAULT_TOLERANCE})")
+    return p
+
+def run(args):
+    try:
+        files, columns = parse_counts(args.files), parse_counts(args.columns)
+        delimiters = [parse_delimiter(d) for d in args.delimiters.split(',') if d]
+        encodings = [e.strip() for e in args.encodings.split(',') if e.strip()]
+        for e in encodings:
+            ''.encode(e)
+    except (ValueError, LookupError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    if 'auto' in delimiters:
+        print("Error: 'auto' is not a delimiter to generate", file=sys.stderr)
+        return EXIT_ERROR
+    baseline = None
+    if args.baseline:
+        try:
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error: Cannot read baseline {args.baseline}: {e}", file=sys.stderr)
+            return EXIT_ERROR
+
+    tmp = None if args.data else tempfile.TemporaryDirectory(prefix='header_bench_')
+    data_dir = args.data or tmp.name
+    results = {'version': BENCH_VERSION, 'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+               'environment': environment(args.workers), 'scenarios': []}
+    try:
+        print(f"{'Scenario':<28} " + " ".join(f"{p:>9}" for p in PHASES))
+        for n_files, n_columns in itertools.product(files, columns):
+            params = {'files': n_files, 'columns': n_columns, 'delimiters': delimiters, 'encodings': encodings,
+                      'missing': args.missing, 'reorder': args.reorder, 'case': args.case,
+                      'renamed': args.renamed, 'seed': args.seed}
+            main, comp = prepare(data_dir, params)
+            phases = run_scenario(main, comp, args.repeat, args.workers, args.reorder_mode)
+            name = scenario_name(params)
+            results['scenarios'].append({'name': name, 'params': params, 'phases': phases,
+                                         'total': sum(phases.values())})
+            print(f"{name:<28} " + " ".join(f"{phases[p]:9.4f}" for p in PHASES), flush=True)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+    if args.output:
+        try:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=1)
+        except OSError as e:
+            print(f"Error: Failed saving results: {e}", file=sys.stderr)
+            return EXIT_ERROR
+    if baseline is None:
+        return EXIT_OK
+    lines, regressions = compare_baseline(baseline, results, args.tolerance)
+    print(f"\nAgainst {args.baseline} ({baseline.get('created', '?')}):")
+    print("\n".join(lines))
+    print(f"{regressions} phase(s) slower by more than {args.tolerance:.0%}")
+    return EXIT_REGRESSION if regressions else EXIT_OK
+
+def main(argv=None):
+    return run(build_parser().parse_args(argv))
+
+if __name__ == "__main__":
+    sys.exit(main())
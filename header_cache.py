@@ -0,0 +1,150 @@
+"""Persistent SQLite cache of header lines keyed by (absolute path, size, mtime)."""
+import codecs
+import os
+import sqlite3
+import threading
+import time
+
+from archive_io import container_path
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.header_compare_cache.sqlite')
+DEFAULT_MAX_ENTRIES = 200000
+# Rows stat'ed per prune(); the batch rotates, so every row is checked once per max_entries / batch runs
+PRUNE_BATCH = 2000
+
+# SQLite limits bound parameters per statement; look up stale paths in chunks
+_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS headers (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    line TEXT NOT NULL,
+    encoding TEXT,
+    read_settings TEXT,
+    delimiter TEXT,
+    confidence REAL,
+    delim_partner TEXT,
+    last_used REAL NOT NULL,
+    checked REAL
+);
+CREATE INDEX IF NOT EXISTS headers_last_used ON headers (last_used);
+"""
+
+def cache_key(path):
+    """Rows are keyed by absolute path, so runs from another working directory share them."""
+    return os.path.abspath(path)
+
+def read_settings(fallback_encoding, header_limit):
+    """Text form of the reader settings a cached header depends on."""
+    return f"{codecs.lookup(fallback_encoding).name}\0{header_limit}"
+
+class HeaderCache:
+    """
+    On-disk companion to HeaderStore. A row is only trusted when the file's current
+    (size, mtime_ns) equals the stored one and it was read with the same settings
+    (fallback code page and header byte limit, see read_settings()). delimiter/confidence/delim_partner
+    remember the detection for the file against a given comparison file stamp
+    (delim_partner NULL = never detected, '' = detected without a partner).
+    """
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES, prune_batch=PRUNE_BATCH):
+        self.path = path
+        self.max_entries = max_entries
+        self.prune_batch = prune_batch
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        # Caches written by earlier versions lack the newer columns; their rows never match read settings
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(headers)")}
+        if 'confidence' not in columns:
+            self._conn.execute("ALTER TABLE headers ADD COLUMN confidence REAL")
+        if 'read_settings' not in columns:
+            self._conn.execute("ALTER TABLE headers ADD COLUMN read_settings TEXT")
+        if 'checked' not in columns:
+            self._conn.execute("ALTER TABLE headers ADD COLUMN checked REAL")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS headers_checked ON headers (checked)")
+
+    def lookup(self, stamps, settings):
+        """
+        Return {path: (line, encoding)} for the paths in {path: (size, mtime_ns)} whose
+        stamp still matches and whose header was read with the same settings.
+        """
+        hits = {}
+        keys = {cache_key(p): p for p in stamps}
+        paths = list(keys)
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(paths), _CHUNK):
+                chunk = paths[i:i + _CHUNK]
+                rows = self._conn.execute(
+                    f"SELECT path, size, mtime_ns, line, encoding, read_settings FROM headers "
+                    f"WHERE path IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+                for key, size, mtime_ns, line, encoding, read_with in rows:
+                    if stamps[keys[key]] == (size, mtime_ns) and read_with == settings:
+                        hits[keys[key]] = (line, encoding)
+            self._conn.executemany("UPDATE headers SET last_used=? WHERE path=?",
+                                   [(now, cache_key(p)) for p in hits])
+            self._conn.commit()
+        return hits
+
+    def store(self, rows, settings):
+        """Save (path, (size, mtime_ns), line, encoding) tuples read with settings, dropping any remembered delimiter."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO headers (path, size, mtime_ns, line, encoding, read_settings, delimiter, "
+                "confidence, delim_partner, last_used) VALUES (?, ?, ?, ?, ?, ?, NULL, NULL, NULL, ?)",
+                [(cache_key(p), st[0], st[1], line, enc, settings, now) for p, st, line, enc in rows])
+            self._conn.commit()
+
+    def delimiters(self, paths):
+        """Return {path: (delimiter, confidence, partner_key)} for paths with a remembered detection."""
+        found = {}
+        keys = {cache_key(p): p for p in paths}
+        paths = list(keys)
+        with self._lock:
+            for i in range(0, len(paths), _CHUNK):
+                chunk = paths[i:i + _CHUNK]
+                found.update((keys[p], (d, c, k)) for p, d, c, k in self._conn.execute(
+                    f"SELECT path, delimiter, confidence, delim_partner FROM headers "
+                    f"WHERE delim_partner IS NOT NULL AND path IN ({','.join('?' * len(chunk))})", chunk))
+        return found
+
+    def remember_delimiters(self, rows):
+        """Save (path, Detection, partner_key) tuples for already cached paths."""
+        with self._lock:
+            self._conn.executemany("UPDATE headers SET delimiter=?, confidence=?, delim_partner=? WHERE path=?",
+                                   [(d.delimiter, d.confidence, k, cache_key(p)) for p, d, k in rows])
+            self._conn.commit()
+
+    def prune(self):
+        """
+        Drop entries for files that no longer exist, then evict the least recently
+        used rows above max_entries. Only rows not used since this cache was opened
+        are stat'ed, and at most prune_batch of them per call, longest unchecked
+        first, so a large cache shared by many folders (or on a network share)
+        costs a bounded number of stats per run. Returns the number of rows removed.
+        """
+        with self._lock:
+            stale = [p for (p,) in self._conn.execute(
+                "SELECT path FROM headers WHERE last_used < ? ORDER BY checked LIMIT ?",
+                (self.started, self.prune_batch))]
+        gone = [(p,) for p in stale if not os.path.exists(container_path(p))]
+        now = time.time()
+        with self._lock:
+            self._conn.executemany("UPDATE headers SET checked=? WHERE path=?", [(now, p) for p in stale])
+            self._conn.executemany("DELETE FROM headers WHERE path=?", gone)
+            removed = len(gone)
+            count = self._conn.execute("SELECT COUNT(*) FROM headers").fetchone()[0]
+            if count > self.max_entries:
+                removed += self._conn.execute(
+                    "DELETE FROM headers WHERE path IN (SELECT path FROM headers ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,)).rowcount
+            self._conn.commit()
+        return removed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,329 @@
+"""Headless command-line front end for the header comparison engine (no tkinter import)."""
+import argparse
+import codecs
+import os
+import sys
+import time
+
+import header_engine as engine
+from column_renames import DEFAULT_RENAME_CUTOFF
+from folder_scan import DEFAULT_EXTENSIONS, parse_extensions
+from folder_watch import DEFAULT_DEBOUNCE, DEFAULT_INTERVAL
+from header_cache import HeaderCache, DEFAULT_MAX_ENTRIES
+from header_reader import DEFAULT_FALLBACK_ENCODING, DEFAULT_HEADER_LIMIT
+from run_manifest import RunManifest
+from run_stats import PROFILE_SUFFIX, STATS_SUFFIX, RunStats, profiled, timed
+from schema_index import SchemaIndex, folder_labels, iter_nway_report
+
+EXIT_OK = 0
+EXIT_DIFF = 1
+EXIT_ERROR = 2
+
+DELIMITER_ALIASES = {
+    'pipe': '|',
+    'backslash': '\\',
+    'slash': '/',
+    'comma': ',',
+    'colon': ':',
+    'semicolon': ';',
+    'tab': '\t',
+    'space': ' ',
+    'doublecolon': '::',
+    'tilde': '~',
+}
+
+def parse_delimiter(value):
+    """Return 'auto', None (whitespace) or a delimiter string for a --delimiter value."""
+    low = value.lower()
+    if low == 'auto':
+        return 'auto'
+    if low in ('none', 'whitespace'):
+        return None
+    if low in DELIMITER_ALIASES:
+        return DELIMITER_ALIASES[low]
+    if value in engine.DELIMITERS:
+        return engine.DELIMITERS[value]
+    if not value:
+        raise ValueError("empty delimiter")
+    return value.replace('\\t', '\t')  # allow a literal "\t" from the shell
+
+def build_parser():
+    p = argparse.ArgumentParser(
+        prog='header_cli',
+        description="Compare the header line of files in a main folder against a comparison folder. "
+                    "With several comparison folders (or a saved schema as reference) every folder is checked "
+                    "against the reference in one run and a drift matrix is written. "
+                    "Exits with 0 when everything matches, 1 when differences were found and 2 on errors.")
+    p.add_argument('main_folder', help="folder with the reference files, or a schema file saved with --save-schema")
+    p.add_argument('comp_folders', nargs='+', metavar='comp_folder', help="folder(s) with the files to compare")
+    p.add_argument('-o', '--output', default='-', help="report path ('-' for stdout, the default)")
+    p.add_argument('-r', '--recursive', action='store_true',
+                   help="scan subfolders too; files are paired by their path relative to each folder")
+    p.add_argument('--ext', default=','.join(DEFAULT_EXTENSIONS), metavar='LIST',
+                   help="comma-separated file extensions to compare, '*' for any "
+                        f"(default {','.join(DEFAULT_EXTENSIONS)})")
+    p.add_argument('--include', action='append', default=[], metavar='GLOB',
+                   help="only compare files whose relative path or name matches GLOB (repeatable)")
+    p.add_argument('--exclude', action='append', default=[], metavar='GLOB',
+                   help="skip files and subfolders whose relative path or name matches GLOB (repeatable)")
+    p.add_argument('--no-archives', dest='archives', action='store_false',
+                   help="do not list the members of .zip/.tar(.gz/.bz2/.xz) archives as files")
+    p.add_argument('-d', '--delimiter', default='auto',
+                   help="'auto' (per-file detection, default), 'none' (whitespace), a name such as "
+                        f"{', '.join(DELIMITER_ALIASES)}, or a literal delimiter")
+    p.add_argument('--sample-rows', type=int, default=0, metavar='N',
+                   help="also read N data rows per main file to confirm the detected delimiter (default 0)")
+    p.add_argument('-j', '--workers', type=int, default=engine.DEFAULT_WORKERS,
+                   help=f"concurrent header reads (default {engine.DEFAULT_WORKERS}, 1 = sequential)")
+    p.add_argument('--reorder', choices=engine.REORDER_MODES, default=engine.REORDER_POSITION,
+                   help="'position' lists every column whose position differs (default); "
+                        "'moves' lists only the minimal set of columns that moved")
+    p.add_argument('--renames', type=float, nargs='?', const=DEFAULT_RENAME_CUTOFF, metavar='CUTOFF',
+                   help="suggest renamed columns: pair missing with extra columns whose names are at least "
+                        f"CUTOFF similar (0-1, default {DEFAULT_RENAME_CUTOFF})")
+    p.add_argument('--matrix', action='store_true',
+                   help="write the N-way drift matrix report even for a single comparison folder")
+    p.add_argument('--save-schema', metavar='PATH',
+                   help="save the reference headers (and their delimiters) as a schema file for later runs")
+    p.add_argument('--group', action='store_true',
+                   help="write one block per distinct result followed by the file pairs it applies to")
+    p.add_argument('--manifest', metavar='PATH',
+                   help="run manifest: pairs unchanged since the manifest was written reuse their earlier "
+                        "result without being read; the manifest is updated after the run")
+    p.add_argument('--watch', action='store_true',
+                   help="after the report keep polling both folders and append a block for every pair "
+                        "whose files appear or change (stop with Ctrl+C)")
+    p.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, metavar='SECONDS',
+                   help=f"watch mode poll interval (default {DEFAULT_INTERVAL})")
+    p.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE, metavar='SECONDS',
+                   help="watch mode: a file must keep its size and mtime this long before it is compared "
+                        f"(default {DEFAULT_DEBOUNCE})")
+    p.add_argument('--stats', action='store_true',
+                   help="append per-phase timings, call counts, bytes read and the slowest files to the report "
+                        f"and save them as JSON next to it (OUTPUT{STATS_SUFFIX})")
+    p.add_argument('--profile', action='store_true',
+                   help=f"run under cProfile and write the profile next to the report (OUTPUT{PROFILE_SUFFIX})")
+    p.add_argument('--max-header-bytes', type=int, default=DEFAULT_HEADER_LIMIT, metavar='N',
+                   help=f"reject headers longer than N bytes instead of reading on (default {DEFAULT_HEADER_LIMIT})")
+    p.add_argument('--fallback-encoding', default=DEFAULT_FALLBACK_ENCODING, metavar='CODEC',
+                   help="code page for headers that are neither UTF-16/32 (BOM or NUL pattern) nor valid UTF-8 "
+                        f"(default {DEFAULT_FALLBACK_ENCODING})")
+    p.add_argument('--cache', metavar='PATH',
+                   help="persistent header cache (SQLite); unchanged files are not read again on later runs")
+    p.add_argument('--cache-max', type=int, default=DEFAULT_MAX_ENTRIES,
+                   help=f"maximum cached files before least recently used ones are evicted (default {DEFAULT_MAX_ENTRIES})")
+    p.add_argument('--cutoff', type=float, default=engine.DEFAULT_CUTOFF,
+                   help=f"fuzzy file-name match cutoff (0-1, default {engine.DEFAULT_CUTOFF})")
+    p.add_argument('-q', '--quiet', action='store_true', help="do not print the summary line to stderr")
+    return p
+
+def run(args):
+    mf, comps = args.main_folder, args.comp_folders
+    nway = args.matrix or args.save_schema or len(comps) > 1 or os.path.isfile(mf)
+    if not (os.path.isdir(mf) or (nway and os.path.isfile(mf))) or not all(os.path.isdir(c) for c in comps):
+        print("Error: Invalid folder paths!", file=sys.stderr)
+        return EXIT_ERROR
+    try:
+        delim = parse_delimiter(args.delimiter)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    if args.renames is not None and not 0 < args.renames <= 1:
+        print("Error: --renames cutoff must be between 0 and 1", file=sys.stderr)
+        return EXIT_ERROR
+    try:
+        codecs.lookup(args.fallback_encoding)
+    except LookupError:
+        print(f"Error: Unknown encoding {args.fallback_encoding}", file=sys.stderr)
+        return EXIT_ERROR
+
+    try:
+        cache = HeaderCache(args.cache, args.cache_max) if args.cache else None
+    except Exception as e:
+        print(f"Error: Cannot open cache {args.cache}: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    if args.watch and nway:
+        print("Error: --watch compares one main folder with one comparison folder", file=sys.stderr)
+        return EXIT_ERROR
+    profile = (args.output if args.output != '-' else 'header_cli') + PROFILE_SUFFIX if args.profile else None
+    try:
+        with profiled(profile):
+            if nway:
+                return compare_nway(args, delim, cache)
+            if args.watch:
+                return watch_folders(args, delim, cache)
+            return compare_folders(args, delim, cache)
+    except OSError as e:
+        # A failure halfway (full disk, vanished share) must not read as EXIT_DIFF
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    finally:
+        if cache is not None:
+            cache.prune()
+            cache.close()
+
+def scan_options(args):
+    return args.recursive, parse_extensions(args.ext), args.include, args.exclude, args.archives
+
+def open_output(args):
+    try:
+        return sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    except OSError as e:
+        print(f"Error: Failed saving report: {e}", file=sys.stderr)
+        return None
+
+def write_stats(args, out, stats):
+    """Append the stats footer to the report and save the JSON sidecar; returns False if that failed."""
+    if stats is None:
+        return True
+    out.write("\n" + stats.format_footer(engine.RULE))
+    if args.output == '-':
+        return True
+    try:
+        stats.save(args.output + STATS_SUFFIX)
+    except OSError as e:
+        print(f"Error: Failed saving stats: {e}", file=sys.stderr)
+        return False
+    return True
+
+def compare_folders(args, delim, cache):
+    mf, cf = args.main_folder, args.comp_folders[0]
+    stats = RunStats() if args.stats else None
+    store = engine.HeaderStore(args.workers, cache, args.max_header_bytes, args.fallback_encoding, stats,
+                               args.renames)
+    scan = scan_options(args)
+    with timed(stats, 'scan'):
+        main_files = engine.find_files(mf, *scan)
+        comp_files = engine.find_files(cf, *scan)
+    with timed(stats, 'match'):
+        matches = engine.match_files(main_files, comp_files, cutoff=args.cutoff)
+    if stats is not None:
+        stats.count('scan', len(main_files) + len(comp_files))
+        stats.count('match', len(main_files))
+    manifest = RunManifest(args.manifest, mf, cf) if args.manifest else None
+    if delim == 'auto':
+        detections = engine.detect_delimiters(mf, cf, matches, args.workers, store, args.sample_rows, manifest)
+        delimiters = {m: d.delimiter for m, d in detections.items()}
+    else:
+        delimiters = dict.fromkeys(main_files, delim)
+
+    out = open_output(args)
+    if out is None:
+        return EXIT_ERROR
+    try:
+        blocks = engine.iter_report(mf, cf, main_files, comp_files, matches, delimiters,
+                                    args.workers, store, args.reorder, grouped=args.group, manifest=manifest)
+        with timed(stats, 'report'):
+            written, differs, _ = engine.write_report(out, blocks)
+        if stats is not None:
+            stats.count('report', written)
+        stats_saved = write_stats(args, out, stats)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if manifest is not None:
+        try:
+            manifest.save()
+        except OSError as e:
+            print(f"Error: Failed saving manifest: {e}", file=sys.stderr)
+            return EXIT_ERROR
+    if not stats_saved:
+        return EXIT_ERROR
+
+    if not args.quiet:
+        reused = f", {manifest.reused} reused from the manifest" if manifest is not None else ""
+        print(f"{len(main_files)} main / {len(comp_files)} comparison files, "
+              f"{differs} report block(s) with differences{reused}", file=sys.stderr)
+    return EXIT_DIFF if differs else EXIT_OK
+
+def watch_folders(args, delim, cache):
+    """Write the full report, then append a block whenever a pair's files appear or change."""
+    mf, cf = args.main_folder, args.comp_folders[0]
+    store = engine.HeaderStore(args.workers, cache, args.max_header_bytes, args.fallback_encoding,
+                               rename_cutoff=args.renames)
+    session = engine.WatchSession(mf, cf, scan_options(args), store, args.workers, delim, args.sample_rows,
+                                  args.reorder, args.cutoff, args.debounce)
+    session.start()
+    out = open_output(args)
+    if out is None:
+        return EXIT_ERROR
+    try:
+        for block, _ in engine.iter_report(mf, cf, session.main_files(), session.comp_files(), session.matches,
+                                           session.delimiters, args.workers, store, args.reorder, grouped=args.group):
+            out.write(block + "\n")
+        out.flush()
+        if not args.quiet:
+            print(f"Watching {mf} and {cf} (Ctrl+C to stop)", file=sys.stderr)
+        problem = ''
+        while True:
+            time.sleep(args.interval)
+            updates, removed = session.poll()
+            now = time.strftime('%Y-%m-%d %H:%M:%S')
+            # An unreachable folder is retried every interval; say so once per outage
+            if "; ".join(session.errors()) != problem:
+                problem = "; ".join(session.errors())
+                print(f"[{now}] " + (f"Cannot list {problem}, retrying" if problem else "Folders reachable again"),
+                      file=sys.stderr)
+            for m in removed:
+                out.write(f"[{now}] Main file removed: {m}\n\n")
+            for m, c, block, _ in updates:
+                out.write(f"[{now}] {'Changed' if c else 'Unmatched'}: {m}\n{block}\n")
+            if updates or removed:
+                out.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    differs = any(session.differs(m) for m in session.main_files()) or session.unmatched_comp_files()
+    return EXIT_DIFF if differs else EXIT_OK
+
+def compare_nway(args, delim, cache):
+    """Check every comparison folder against the reference index; the reference is read only once."""
+    stats = RunStats() if args.stats else None
+    store = engine.HeaderStore(args.workers, cache, args.max_header_bytes, args.fallback_encoding, stats,
+                               args.renames)
+    scan = scan_options(args)
+    try:
+        with timed(stats, 'index'):
+            if os.path.isfile(args.main_folder):
+                index = SchemaIndex.load(args.main_folder)
+            else:
+                index = SchemaIndex.from_folder(args.main_folder, store, args.workers, scan, delim, args.sample_rows)
+        if args.save_schema:
+            index.save(args.save_schema)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: Schema: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    with timed(stats, 'check'):
+        results = [index.check(folder, store, args.workers, scan, args.reorder, args.cutoff, label)
+                   for folder, label in zip(args.comp_folders, folder_labels(args.comp_folders))]
+    if stats is not None:
+        stats.count('index', len(index.entries))
+        stats.count('check', sum(len(r.cells) for r in results))
+
+    out = open_output(args)
+    if out is None:
+        return EXIT_ERROR
+    try:
+        with timed(stats, 'report'):
+            written, differs, _ = engine.write_report(out, iter_nway_report(index, results))
+        if stats is not None:
+            stats.count('report', written)
+        stats_saved = write_stats(args, out, stats)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if not stats_saved:
+        return EXIT_ERROR
+
+    if not args.quiet:
+        print(f"{len(index.entries)} reference files / {len(results)} folder(s), "
+              f"{differs} report block(s) with differences", file=sys.stderr)
+    return EXIT_DIFF if differs else EXIT_OK
+
+def main(argv=None):
+    return run(build_parser().parse_args(argv))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,776 @@
+import hashlib
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from archive_io import ARCHIVE_SEP, container_path, is_archive, is_tar, split_member
+from column_renames import pair_renames
+from compact_header import CompactHeader, compact, release_names
+# Re-exported: clean_col_name was part of this module's API before compact_header split off
+from compact_header import clean_col_name as clean_col_name
+from delimiter_detect import Detection, detect, split_quoted
+from file_matcher import FileMatcher, DEFAULT_CUTOFF
+from folder_scan import DEFAULT_EXTENSIONS, scan_folder
+from folder_watch import DEFAULT_DEBOUNCE, DEFAULT_FULL_EVERY, FolderWatcher
+from header_cache import read_settings
+from header_reader import (DEFAULT_FALLBACK_ENCODING, DEFAULT_HEADER_LIMIT, ByteCount, read_header,
+                           read_sample_rows, read_tar_headers, read_zip_headers)
+from run_stats import timed
+
+# Define delimiters
+DELIMITERS = {
+    'Pipe (|)': '|',
+    'Backslash (\\)': '\\',
+    'Forward Slash (/)': '/',
+    'Comma (,)': ',',
+    'Colon (:)': ':',
+    'Semicolon (;)': ';',
+    'Tab (\\t)': '\t',
+    'New Line (\\n)': '\n',
+    'Space ( )': ' ',
+    'Double Colon (::)': '::',
+    'Tilde (~)': '~'
+}
+
+# Header reads are I/O bound (network shares), so a small thread pool hides the latency
+DEFAULT_WORKERS = 8
+# Pairs whose headers are prefetched together while the report streams out
+PREFETCH_BATCH = 256
+
+SEPARATOR = "-" * 80
+RULE = "=" * 80
+
+# Result of comparing two CompactHeaders; `exact` is False whenever anything differs.
+# paired maps each main index to its comp index (-1 = none); missing, reorder and
+# case_diff are arrays of main indexes, extra of comp indexes, lt_issues holds
+# (name, leading, trailing, side) tuples and renames (main index, comp index, score)
+# suggestions taken out of missing/extra. Names are looked up in main/comp when formatting.
+Comparison = namedtuple('Comparison', 'exact lt_issues missing extra reorder case_diff reorder_mode main comp paired '
+                                      'renames')
+
+# compare_headers() reorder modes
+REORDER_POSITION = 'position'
+REORDER_MOVES = 'moves'
+REORDER_MODES = (REORDER_POSITION, REORDER_MOVES)
+
+def split_header(line, delimiter):
+    # Quote-aware, so "City, State" stays one column
+    try:
+        return split_quoted(line, delimiter)
+    except Exception:
+        return line.split()  # Fallback to whitespace
+
+def pool_map(fn, items, workers=DEFAULT_WORKERS):
+    """list(map(fn, items)) on a bounded thread pool; results keep the input order."""
+    items = list(items)
+    if workers is None or workers <= 1 or len(items) <= 1:
+        return [fn(i) for i in items]
+    with ThreadPoolExecutor(max_workers=min(workers, len(items))) as pool:
+        return list(pool.map(fn, items))
+
+def file_stamp(path):
+    """(size, mtime_ns) identity of path (of its archive for members), or None when it cannot be stat'ed."""
+    try:
+        st = os.stat(container_path(path))
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+def stamp_key(path, stamp):
+    """Text form of a file identity, used to remember which partner a delimiter was detected against."""
+    return '' if path is None else f"{os.path.abspath(path)}\0{stamp[0] if stamp else ''}\0{stamp[1] if stamp else ''}"
+
+def header_fingerprint(line):
+    """Short hash identifying a raw header line; files with the same header share it."""
+    return hashlib.blake2b(line.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+
+class _Entry:
+    __slots__ = ('stamp', 'line', 'err', 'encoding', 'fingerprint', 'detection', 'delim_partner')
+
+    def __init__(self, stamp, line, err, encoding):
+        self.stamp, self.line, self.err, self.encoding = stamp, line, err, encoding
+        self.fingerprint = header_fingerprint(line) if err is None and line is not None else None
+        self.detection = self.delim_partner = None
+
+class HeaderStore:
+    """
+    In-memory header cache keyed by path. Each entry holds the file stamp, the raw
+    first line (or read error) and its fingerprint. prefetch() re-stats the given
+    paths concurrently and re-reads only those whose size or mtime changed;
+    line()/columns() then serve from memory. Split column lists and comparisons are
+    memoized per fingerprint, so files sharing a header are split and compared once.
+    With a HeaderCache attached, unchanged files are also served from disk across runs.
+    With a RunStats as stats, reads, delimiter detection and comparisons are timed.
+    A rename_cutoff turns on renamed-column suggestions in compare().
+    """
+    def __init__(self, workers=DEFAULT_WORKERS, cache=None, header_limit=DEFAULT_HEADER_LIMIT,
+                 fallback_encoding=DEFAULT_FALLBACK_ENCODING, stats=None, rename_cutoff=None):
+        self.workers = workers
+        self.cache = cache
+        self.header_limit = header_limit
+        self.fallback_encoding = fallback_encoding
+        self.stats = stats
+        self.rename_cutoff = rename_cutoff
+        self._entries = {}  # path -> _Entry
+        self._splits = {}  # (fingerprint, delimiter) -> (columns, error)
+        self._comparisons = {}  # (main fingerprint, comp fingerprint, delimiter, reorder mode) -> Comparison
+        self._lock = threading.Lock()
+
+    def prefetch(self, paths, workers=None):
+        """Make sure every path is loaded and current, reading stale ones in parallel."""
+        with timed(self.stats, 'read'):
+            self._prefetch(paths, workers)
+
+    def _read(self, path):
+        if self.stats is None:
+            return read_header(path, self.header_limit, fallback=self.fallback_encoding)
+        counter, start = ByteCount(), time.perf_counter()
+        result = read_header(path, self.header_limit, fallback=self.fallback_encoding, counter=counter)
+        self.stats.file_read(path, time.perf_counter() - start, counter.total)
+        return result
+
+    def read_settings(self):
+        """Fallback code page and header limit headers are read with, as stored with cached results."""
+        return read_settings(self.fallback_encoding, self.header_limit)
+
+    def _read_members(self, archive, paths):
+        """Headers of several members of one archive: a tar is streamed once, a zip's directory parsed once."""
+        members = [split_member(p)[1] for p in paths]
+        start = time.perf_counter()
+
+        def on_read(member, nbytes):
+            nonlocal start
+            now = time.perf_counter()
+            self.stats.file_read(f"{archive}{ARCHIVE_SEP}{member}", now - start, nbytes)
+            start = now
+
+        read = read_tar_headers if is_tar(archive) else read_zip_headers
+        found = read(archive, members, self.header_limit, self.fallback_encoding,
+                     on_read if self.stats is not None else None)
+        return [found[m] for m in members]
+
+    def _read_batch(self, batch):
+        archive, member = split_member(batch[0])
+        if member is None or not is_archive(archive):
+            return [self._read(batch[0])]
+        return self._read_members(archive, batch)
+
+    def _prefetch(self, paths, workers):
+        workers = self.workers if workers is None else workers
+        unique = list(dict.fromkeys(p for p in paths if p))
+        stamps = dict(zip(unique, pool_map(file_stamp, unique, workers)))
+        with self._lock:
+            stale = [p for p in unique
+                     if stamps[p] is None or p not in self._entries or self._entries[p].stamp != stamps[p]]
+        if not stale:
+            return
+        loaded, hits = {}, {}
+        if self.cache is not None:
+            settings = self.read_settings()
+            hits = self.cache.lookup({p: stamps[p] for p in stale if stamps[p] is not None}, settings)
+            for p, (line, encoding) in hits.items():
+                loaded[p] = _Entry(stamps[p], line, None, encoding)
+            stale = [p for p in stale if p not in hits]
+        # Members of an archive are read together: opening each one alone would stream
+        # a tar from its start or parse a zip's central directory every time
+        batches, archives = [], {}
+        for p in stale:
+            archive, member = split_member(p)
+            if member is not None and is_archive(archive):
+                archives.setdefault(archive, []).append(p)
+            else:
+                batches.append([p])
+        batches += archives.values()
+        stale = [p for batch in batches for p in batch]
+        results = [r for found in pool_map(self._read_batch, batches, workers) for r in found]
+        for p, (line, encoding, err) in zip(stale, results):
+            loaded[p] = _Entry(stamps[p], line, err, encoding)
+        with self._lock:
+            self._entries.update(loaded)
+        if self.cache is not None:
+            self.cache.store([(p, stamps[p], line, encoding)
+                              for p, (line, encoding, err) in zip(stale, results) if err is None and stamps[p] is not None],
+                             settings)
+            for p, (d, conf, k) in self.cache.delimiters(hits).items():
+                loaded[p].detection, loaded[p].delim_partner = Detection(d, conf), k
+
+    def _entry(self, path):
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is None:
+            self.prefetch([path], workers=1)
+            with self._lock:
+                entry = self._entries[path]
+        return entry
+
+    def stamp(self, path):
+        return self._entry(path).stamp
+
+    def encoding(self, path):
+        """Encoding the header of path was decoded with (None if it could not be read)."""
+        return self._entry(path).encoding
+
+    def fingerprint(self, path):
+        """Fingerprint of the header of path (None if it could not be read)."""
+        return self._entry(path).fingerprint
+
+    def line(self, path):
+        """Return (line, error) for path, reading it only if it was never loaded."""
+        entry = self._entry(path)
+        return entry.line, entry.err
+
+    def columns(self, path, delimiter):
+        """Return (columns, error) of the header of path split on delimiter, memoized per fingerprint and delimiter."""
+        entry = self._entry(path)
+        if entry.fingerprint is None:
+            return header_from_line(entry.line, entry.err, delimiter)
+        key = (entry.fingerprint, delimiter)
+        if key not in self._splits:
+            self._splits[key] = header_from_line(entry.line, entry.err, delimiter)
+        return self._splits[key]
+
+    def compare(self, main_path, comp_path, delimiter, reorder_mode=REORDER_POSITION):
+        """
+        Return (Comparison or None, main error, comp error) for a pair. Each distinct
+        (main header, comparison header, delimiter, mode) is compared only once.
+        """
+        mcols, me = self.columns(main_path, delimiter)
+        ccols, ce = self.columns(comp_path, delimiter)
+        if me or ce or not mcols or not ccols:
+            return (None, (me or 'Header missing') if me or not mcols else None,
+                    (ce or 'Header missing') if ce or not ccols else None)
+        key = (self.fingerprint(main_path), self.fingerprint(comp_path), delimiter, reorder_mode, self.rename_cutoff)
+        result = self._comparisons.get(key)
+        if result is None:
+            result = self._comparisons[key] = compare_headers(mcols, ccols, reorder_mode, self.rename_cutoff)
+        return result, None, None
+
+    def detected_delimiter(self, path, partner):
+        """Return the Detection remembered for path against partner (a stamp_key), or None."""
+        entry = self._entry(path)
+        if entry.delim_partner is not None and entry.delim_partner == partner:
+            return entry.detection
+        return None
+
+    def remember_delimiters(self, rows):
+        """Record (path, Detection, partner) results in memory and in the attached cache."""
+        for path, detection, partner in rows:
+            entry = self._entry(path)
+            entry.detection, entry.delim_partner = detection, partner
+        if self.cache is not None:
+            self.cache.remember_delimiters(rows)
+
+    def invalidate(self, path=None):
+        if path is not None:
+            with self._lock:
+                self._entries.pop(path, None)
+            return
+        with self._lock:
+            self._entries.clear()
+        self.release()
+
+    def release(self):
+        """
+        Drop the split headers and comparisons and start a new column name table
+        (see compact_header.release_names()), so names of files no longer compared
+        can be freed; loaded header lines stay.
+        """
+        with self._lock:
+            self._splits.clear()
+            self._comparisons.clear()
+        release_names()
+
+def header_from_line(first_line, err, delimiter):
+    if err:
+        return None, err
+    if not first_line:
+        return None, "Header missing"
+    return CompactHeader(split_header(first_line, delimiter)), None
+
+def find_files(folder, recursive=False, extensions=DEFAULT_EXTENSIONS, include=(), exclude=(), archives=True):
+    """Sorted data files (and archive members) of folder as '/'-separated relative paths; see folder_scan.scan_folder()."""
+    return scan_folder(folder, recursive, extensions, include, exclude, archives)
+
+def delim_name_from_char(delim_char):
+    for k, v in DELIMITERS.items():
+        if v == delim_char:
+            return k
+    return None
+
+def match_files(main_files, comp_files, cutoff=DEFAULT_CUTOFF):
+    """Map every main file name to its closest comparison file name ('' when none is close enough)."""
+    return FileMatcher(comp_files, cutoff).assign(main_files)
+
+def detect_delimiters(main_folder, comp_folder, matches, workers=DEFAULT_WORKERS, store=None, sample_rows=0,
+                      manifest=None):
+    """
+    Auto-detect the delimiter of every matched pair, reading all headers concurrently
+    into store. With sample_rows > 0 that many data rows of each main file are read to
+    confirm a consistent column count. With a RunManifest, pairs detected by an earlier
+    run whose files are unchanged keep that detection without being read.
+    Returns {main file: Detection}.
+    """
+    store = store or HeaderStore(workers)
+    with timed(store.stats, 'detect'):
+        return _detect_delimiters(main_folder, comp_folder, matches, workers, store, sample_rows, manifest)
+
+def _sample_rows(store, path, rows):
+    if store.stats is None:
+        return read_sample_rows(path, rows, store.header_limit, store.encoding(path))
+    counter = ByteCount()
+    found = read_sample_rows(path, rows, store.header_limit, store.encoding(path), counter)
+    store.stats.count('detect', 0, counter.total)
+    return found
+
+def _detect_delimiters(main_folder, comp_folder, matches, workers, store, sample_rows, manifest):
+    paths = {mf: (os.path.join(main_folder, mf), os.path.join(comp_folder, cf) if cf else None)
+             for mf, cf in matches.items()}
+    detections, pending = {}, []
+    if manifest is not None:
+        flat = [p for pair in paths.values() for p in pair if p]
+        stamps = dict(zip(flat, pool_map(file_stamp, flat, workers)))
+        for mf, (mp, cp) in list(paths.items()):
+            found = manifest.detection(mf, matches[mf], stamps[mp], stamps.get(cp), sample_rows, store.read_settings())
+            if found is not None:
+                detections[mf] = Detection(*found)
+                del paths[mf]
+    store.prefetch([p for pair in paths.values() for p in pair], workers)
+    for mf, (mp, cp) in paths.items():
+        if store.line(mp)[1]:
+            detections[mf] = Detection(None, 0.0)
+            continue
+        partner = f"{stamp_key(cp, store.stamp(cp) if cp else None)}\0{sample_rows}"
+        found = store.detected_delimiter(mp, partner)
+        if found is not None:
+            detections[mf] = found
+        else:
+            pending.append((mf, mp, cp, partner))
+    samples = {}
+    if sample_rows > 0 and pending:
+        main_paths = [mp for _, mp, _, _ in pending]
+        samples = dict(zip(main_paths, pool_map(lambda p: _sample_rows(store, p, sample_rows), main_paths, workers)))
+    detected = []
+    for mf, mp, cp, partner in pending:
+        result = detect(store.line(mp)[0], store.line(cp)[0] if cp else None, DELIMITERS.values(), samples.get(mp, ()))
+        detections[mf] = result
+        detected.append((mp, result, partner))
+    if detected:
+        store.remember_delimiters(detected)
+    if store.stats is not None:
+        store.stats.count('detect', len(detected))
+    if manifest is not None:
+        for mf, (mp, cp) in paths.items():
+            d = detections[mf]
+            manifest.record_detection(mf, matches[mf], store.stamp(mp), store.stamp(cp) if cp else None,
+                                      sample_rows, d.delimiter, d.confidence, store.read_settings())
+    return detections
+
+def longest_increasing_run(seq):
+    """Indexes of one longest strictly increasing subsequence of seq (patience sorting, O(n log n))."""
+    tails, tail_idx, prev = [], [], [None] * len(seq)
+    for i, v in enumerate(seq):
+        k = bisect_left(tails, v)
+        if k == len(tails):
+            tails.append(v)
+            tail_idx.append(i)
+        else:
+            tails[k] = v
+            tail_idx[k] = i
+        prev[i] = tail_idx[k - 1] if k else None
+    out = []
+    i = tail_idx[-1] if tail_idx else None
+    while i is not None:
+        out.append(i)
+        i = prev[i]
+    out.reverse()
+    return out
+
+def pair_columns(mkeys, ckeys):
+    """
+    Pair main and comparison columns by normalized name id in one pass each. The k-th
+    occurrence of a name in main pairs with its k-th occurrence in comparison, so
+    duplicate column names are matched positionally instead of all to the first one.
+    Returns (array mapping each main index to its comp index or -1, unpaired comp indexes).
+    """
+    first, repeats = {}, {}
+    for j, key in enumerate(ckeys):
+        if key in first:
+            repeats.setdefault(key, []).append(j)
+        else:
+            first[key] = j
+    paired = array('i', [-1]) * len(mkeys)
+    taken = bytearray(len(ckeys))
+    used = {}
+    for i, key in enumerate(mkeys):
+        j = first.get(key)
+        if j is None:
+            continue
+        k = used.get(key, 0)
+        if k:
+            more = repeats.get(key, ())
+            if k > len(more):
+                continue
+            j = more[k - 1]
+        used[key] = k + 1
+        paired[i] = j
+        taken[j] = 1
+    return paired, array('i', [j for j, t in enumerate(taken) if not t])
+
+def compare_headers(main_cols, comp_cols, reorder_mode=REORDER_POSITION, rename_cutoff=None):
+    """
+    Compare two split headers (CompactHeaders or plain column lists) in linear time
+    (plus O(n log n) for the 'moves' mode). reorder_mode 'position' reports every
+    paired column whose position differs; 'moves' reports only the minimal set of
+    columns that have to move, i.e. those outside the longest run already in the
+    same relative order. Works on the integer id arrays only; no column list is copied.
+    With rename_cutoff, missing and extra columns with similar names are suggested
+    as renames (see column_renames.pair_renames()) instead of being listed apart.
+    """
+    # Ids only compare within one name table; a header from another is rebuilt
+    main = compact(main_cols, getattr(comp_cols, 'table', None))
+    comp = compact(comp_cols, main.table)
+    paired, extra = pair_columns(main.keys, comp.keys)
+    missing = array('i', [i for i, j in enumerate(paired) if j < 0])
+    renames = ()
+    if rename_cutoff is not None and missing and extra:
+        found = pair_renames([main.names[i] for i in missing], [comp.names[j] for j in extra], rename_cutoff)
+        if found:
+            renames = tuple((missing[m], extra[e], score) for m, e, score in found)
+            renamed_main, renamed_comp = {i for i, _, _ in renames}, {j for _, j, _ in renames}
+            missing = array('i', [i for i in missing if i not in renamed_main])
+            extra = array('i', [j for j in extra if j not in renamed_comp])
+    if reorder_mode == REORDER_MOVES:
+        order = array('i', [i for i, j in enumerate(paired) if j >= 0])
+        keep = set(longest_increasing_run(array('i', [paired[i] for i in order])))
+        reorder = array('i', [i for k, i in enumerate(order) if k not in keep])
+    else:
+        reorder = array('i', [i for i, j in enumerate(paired) if j >= 0 and i != j])
+    lt_issues = ([(main.names[i], l, t, 'Main') for i, l, t in main.padded] +
+                 [(comp.names[i], l, t, 'Comparison') for i, l, t in comp.padded])
+    padded_keys = {main.keys[i] for i, _, _ in main.padded} | {comp.keys[i] for i, _, _ in comp.padded}
+
+    # Compare cleaned names so a BOM on the first column is not reported as a case change
+    mclean, cclean, mkeys = main.clean, comp.clean, main.keys
+    case_diff = array('i', [i for i, j in enumerate(paired)
+                            if j >= 0 and mclean[i] != cclean[j] and mkeys[i] not in padded_keys])
+
+    exact = len(main) == len(comp) and mclean == cclean and not lt_issues
+    return Comparison(exact, lt_issues, missing, extra, reorder, case_diff, reorder_mode, main, comp, paired, renames)
+
+def format_heading(main_name, comp_name, encodings=None, pairs=None, status=None):
+    """Block heading; with pairs (a grouped block) the file names are listed by format_pairs() instead."""
+    if pairs:
+        out = [SEPARATOR, f"Same result for {len(pairs)} file pair(s)"]
+    else:
+        out = [SEPARATOR, f"Main File: {main_name}", f"Comparison File: {comp_name}"]
+    if status:
+        out.append(f"Result: {status}")
+    if encodings:
+        out.append(f"Encoding: Main={encodings[0] or '?'} Comparison={encodings[1] or '?'}")
+    out.append(SEPARATOR)
+    return out
+
+def format_pairs(pairs):
+    return ["\nApplies to:"] + [f" - {mf} -> {cf}" for mf, cf in pairs] if pairs else []
+
+def comparison_lines(result):
+    """Body lines of a report block for a Comparison."""
+    out = []
+    if result.exact:
+        out.append("Headers match exactly.")
+    if result.lt_issues:
+        out.append("\nLeading/Trailing space issues:")
+        for c,l,t,o in result.lt_issues:
+            out.append(f" - [{o}] '{c}' Lead:{l} Trail:{t}")
+    if not result.exact:
+        mnames, cnames, paired = result.main.names, result.comp.names, result.paired
+        if result.missing:
+            out.append("\nMissing in Comparison:")
+            out += [f" - {mnames[i]}" for i in result.missing]
+        if result.extra:
+            out.append("\nExtra in Comparison:")
+            out += [f" - {cnames[j]}" for j in result.extra]
+        if result.renames:
+            out.append("\nPossible renames:")
+            out += [f" - '{mnames[i]}' -> '{cnames[j]}' Score:{score:.2f} Main:{i + 1} Comp:{j + 1}"
+                    for i, j, score in result.renames]
+        if result.reorder:
+            out.append("\nMoved columns (minimal set):" if result.reorder_mode == REORDER_MOVES else "\nReordered columns:")
+            out += [f" - '{mnames[i]}' Main:{i + 1} Comp:{paired[i] + 1}" for i in result.reorder]
+        if result.case_diff:
+            out.append("\nCase differences:")
+            out += [f" - Main:'{mnames[i]}' vs Comp:'{cnames[paired[i]]}'" for i in result.case_diff]
+    return out
+
+def error_lines(main_err, comp_err):
+    err = []
+    if main_err:
+        err.append(f"In Main: {main_err}")
+    if comp_err:
+        err.append(f"In Comparison: {comp_err}")
+    return err
+
+def format_block(main_name, comp_name, body, encodings=None, pairs=None, status=None):
+    out = format_heading(main_name, comp_name, encodings, pairs, status) + body + format_pairs(pairs)
+    out.append(RULE)
+    out.append("")
+    return "\n".join(out)
+
+def format_unmatched(title, files):
+    return RULE + f"\n{title}:\n" + "\n".join(f" - {f}" for f in sorted(files)) + "\n" + RULE + "\n"
+
+def result_lines(result, main_err, comp_err):
+    """(body lines, differs) for the outcome of HeaderStore.compare()."""
+    if result is None:
+        return error_lines(main_err, comp_err), True
+    return comparison_lines(result), not result.exact
+
+def format_result(main_name, comp_name, result, main_err, comp_err, encodings, pairs=None):
+    """Report block for the outcome of HeaderStore.compare(); returns (block, differs)."""
+    body, differs = result_lines(result, main_err, comp_err)
+    return format_block(main_name, comp_name, body, encodings, pairs), differs
+
+def compare_pair(main_path, comp_path, delimiter, main_name, comp_name, store=None, reorder_mode=REORDER_POSITION):
+    """Compare one matched pair; return (report block, differs)."""
+    store = store or HeaderStore(workers=1)
+    result, me, ce = store.compare(main_path, comp_path, delimiter, reorder_mode)
+    return format_result(main_name, comp_name, result, me, ce, (store.encoding(main_path), store.encoding(comp_path)))
+
+def iter_report(main_folder, comp_folder, main_files, comp_files, matches, delimiters,
+                workers=DEFAULT_WORKERS, store=None, reorder_mode=REORDER_POSITION, progress=None, grouped=False,
+                manifest=None):
+    """
+    Yield (block, differs) for every matched pair in main_files order, followed by
+    the unmatched file lists. matches maps main file -> comparison file ('' = unmatched),
+    delimiters maps main file -> delimiter character (None = whitespace).
+    Headers are fetched concurrently PREFETCH_BATCH pairs at a time (unchanged files
+    come from store), so blocks stream out in order while later batches are pending.
+    With grouped, pairs with the same headers, delimiter and encodings share one
+    block listing all of them; those blocks follow once every pair is compared.
+    With a RunManifest, pairs whose files, match and delimiter are unchanged since
+    the manifest was written reuse the recorded result without reading either file;
+    blocks are marked new or reused and the manifest is updated for saving.
+    progress(done, total) is called after each compared pair.
+    """
+    store = store or HeaderStore(workers)
+    unmatched_m, unmatched_c = set(main_files), set(comp_files)
+    pairs = [(mf, matches[mf]) for mf in main_files if matches.get(mf)]
+    groups = {}  # result key -> (body, encodings, differs, [(main, comp)]) in first-seen order
+    for start in range(0, len(pairs), PREFETCH_BATCH):
+        batch = pairs[start:start + PREFETCH_BATCH]
+        paths = {mf: (os.path.join(main_folder, mf), os.path.join(comp_folder, cf)) for mf, cf in batch}
+        reused = {}
+        if manifest is not None:
+            # A stat per file decides what is reused; only the rest is read
+            with timed(store.stats, 'manifest'):
+                flat = [p for pair in paths.values() for p in pair]
+                stamps = dict(zip(flat, pool_map(file_stamp, flat, workers)))
+                for mf, cf in batch:
+                    mp, cp = paths[mf]
+                    rec = manifest.lookup(mf, cf, stamps[mp], stamps[cp], delimiters.get(mf), reorder_mode,
+                                          store.rename_cutoff, store.read_settings())
+                    if rec is not None:
+                        reused[mf] = rec
+            if store.stats is not None:
+                store.stats.count('manifest', len(reused))
+        store.prefetch([p for mf, pair in paths.items() if mf not in reused for p in pair], workers)
+        for done, (mf, cf) in enumerate(batch, start=start + 1):
+            mp, cp = paths[mf]
+            delim = delimiters.get(mf)
+            if mf in reused:
+                rec = reused[mf]
+                body, differs, status = rec['body'], rec['differs'], 'reused'
+                encodings, fingerprints = tuple(rec['encodings']), tuple(rec['fingerprints'])
+            else:
+                with timed(store.stats, 'compare'):
+                    result, me, ce = store.compare(mp, cp, delim, reorder_mode)
+                    body, differs = result_lines(result, me, ce)
+                if store.stats is not None:
+                    store.stats.count('compare')
+                encodings = (store.encoding(mp), store.encoding(cp))
+                fingerprints = (store.fingerprint(mp), store.fingerprint(cp))
+                status = 'new'
+                if manifest is not None:
+                    manifest.record(mf, cf, store.stamp(mp), store.stamp(cp), delim, reorder_mode,
+                                    fingerprints, encodings, body, differs, store.rename_cutoff, store.read_settings())
+            if manifest is None:
+                status = None
+            if grouped:
+                key = fingerprints + (delim, encodings, tuple(body))
+                shown = f"{cf} ({status})" if status else cf
+                groups.setdefault(key, (body, encodings, differs, []))[3].append((mf, shown))
+            else:
+                yield format_block(mf, cf, body, encodings, status=status), differs
+            unmatched_m.discard(mf)
+            unmatched_c.discard(cf)
+            if progress:
+                progress(done, len(pairs))
+
+    for body, encodings, differs, members in groups.values():
+        yield format_block(None, None, body, encodings, members), differs
+    if unmatched_m:
+        yield format_unmatched("Unmatched Main Files", unmatched_m), True
+    if unmatched_c:
+        yield format_unmatched("Unmatched Comparison Files", unmatched_c), True
+
+class WatchSession:
+    """
+    Keeps a two-folder comparison current while files land. start() lists both
+    folders, matches and detects delimiters; poll() asks the two FolderWatchers for
+    settled changes, re-matches only the affected main files (new or changed ones,
+    those whose comparison file vanished, and unmatched ones when comparison files
+    arrive) and re-compares only those pairs plus pairs whose comparison file changed.
+    scan is the (recursive, extensions, include, exclude, archives) tuple of find_files().
+    """
+    def __init__(self, main_folder, comp_folder, scan=(), store=None, workers=DEFAULT_WORKERS, delimiter='auto',
+                 sample_rows=0, reorder_mode=REORDER_POSITION, cutoff=DEFAULT_CUTOFF,
+                 debounce=DEFAULT_DEBOUNCE, full_every=DEFAULT_FULL_EVERY):
+        self.main_folder, self.comp_folder = main_folder, comp_folder
+        self.main_watch = FolderWatcher(main_folder, *scan, debounce=debounce, full_every=full_every)
+        self.comp_watch = FolderWatcher(comp_folder, *scan, debounce=debounce, full_every=full_every)
+        self.store = store or HeaderStore(workers)
+        self.workers = workers
+        self.delimiter = delimiter
+        self.sample_rows = sample_rows
+        self.reorder_mode = reorder_mode
+        self.cutoff = cutoff
+        self.matches = {}  # main file -> comparison file ('' = unmatched)
+        self.detections = {}  # main file -> Detection (auto mode only)
+        self.delimiters = {}  # main file -> delimiter used
+        self.fixed = {}  # main file -> delimiter chosen by the user (never detected)
+        self.ignored = set()  # main files left out of the comparison
+
+    def main_files(self):
+        return self.main_watch.files()
+
+    def comp_files(self):
+        return self.comp_watch.files()
+
+    def start(self, matches=None, delimiters=None, ignored=()):
+        """
+        Baseline both folders and match every file; returns the main files. To carry
+        on from an edited comparison, matches (main file -> comparison file) are kept
+        instead of matched, delimiters (main file -> delimiter) are used instead of
+        detected and ignored main files are left out, also when they change later.
+        """
+        self.fixed = dict(delimiters or {})
+        self.ignored = set(ignored)
+        main_files = [mf for mf in self.main_watch.prime() if mf not in self.ignored]
+        comp_files = self.comp_watch.prime()
+        kept = matches or {}
+        taken = {kept[mf] for mf in main_files if mf in kept}
+        found = match_files([mf for mf in main_files if mf not in kept],
+                            [cf for cf in comp_files if cf not in taken], self.cutoff)
+        self.matches = {mf: kept[mf] if mf in kept else found[mf] for mf in main_files}
+        self._detect(main_files)
+        return main_files
+
+    def _detect(self, mains):
+        self.delimiters.update((mf, self.fixed[mf]) for mf in mains if mf in self.fixed)
+        mains = [mf for mf in mains if mf not in self.fixed]
+        if self.delimiter == 'auto':
+            found = detect_delimiters(self.main_folder, self.comp_folder, {mf: self.matches[mf] for mf in mains},
+                                      self.workers, self.store, self.sample_rows)
+            self.detections.update(found)
+            self.delimiters.update((mf, d.delimiter) for mf, d in found.items())
+        else:
+            self.delimiters.update(dict.fromkeys(mains, self.delimiter))
+
+    def poll(self):
+        """
+        Pick up settled changes. Returns (updates, removed): updates are
+        (main file, comparison file, block, differs) for every re-compared main file
+        (unmatched ones get an 'Unmatched Main Files' block), removed the main files
+        that disappeared.
+        """
+        m_changed, m_removed = self.main_watch.poll()
+        c_changed, c_removed = self.comp_watch.poll()
+        if self.ignored:
+            m_changed = [mf for mf in m_changed if mf not in self.ignored]
+            m_removed = [mf for mf in m_removed if mf not in self.ignored]
+        if not (m_changed or m_removed or c_changed or c_removed):
+            return [], []
+        for mf in m_removed:
+            for d in (self.matches, self.detections, self.delimiters):
+                d.pop(mf, None)
+        claimed = {cf: mf for mf, cf in self.matches.items() if cf}
+        affected = set(m_changed)
+        affected.update(claimed[cf] for cf in c_removed if cf in claimed)
+        new_comps = [cf for cf in c_changed if cf not in claimed]
+        if new_comps:
+            affected.update(mf for mf, cf in self.matches.items() if not cf)
+        # Comparison files held by untouched pairs stay theirs; the rest are up for grabs
+        keep = {cf for mf, cf in self.matches.items() if cf and mf not in affected}
+        pool = [cf for cf in self.comp_files() if cf not in keep]
+        self.matches.update(FileMatcher(pool, self.cutoff).assign(sorted(affected)))
+        refresh = sorted(affected | {claimed[cf] for cf in c_changed if cf in claimed and claimed[cf] in self.matches})
+        if not refresh:
+            return [], m_removed
+        self._detect(refresh)
+        paths = {mf: (os.path.join(self.main_folder, mf),
+                      os.path.join(self.comp_folder, self.matches[mf]) if self.matches[mf] else None) for mf in refresh}
+        self.store.prefetch([p for pair in paths.values() for p in pair if p], self.workers)
+        updates = []
+        for mf in refresh:
+            cf = self.matches[mf]
+            if cf:
+                block, differs = compare_pair(paths[mf][0], paths[mf][1], self.delimiters.get(mf), mf, cf,
+                                              self.store, self.reorder_mode)
+            else:
+                block, differs = format_unmatched("Unmatched Main Files", [mf]), True
+            updates.append((mf, cf, block, differs))
+        return updates, m_removed
+
+    def differs(self, main_file):
+        """True if main_file is unmatched or its pair currently differs."""
+        cf = self.matches.get(main_file)
+        if not cf:
+            return True
+        result, _, _ = self.store.compare(os.path.join(self.main_folder, main_file), os.path.join(self.comp_folder, cf),
+                                          self.delimiters.get(main_file), self.reorder_mode)
+        return result is None or not result.exact
+
+    def errors(self):
+        """Why the last poll could not list a watched folder (empty when both were reachable)."""
+        return [f"{w.folder}: {w.error}" for w in (self.main_watch, self.comp_watch) if w.error is not None]
+
+    def unmatched_comp_files(self):
+        taken = set(self.matches.values())
+        return [cf for cf in self.comp_files() if cf not in taken]
+
+def write_report(out, blocks, cancel=None):
+    """
+    Stream (block, differs) items from iter_report() to the text file out, flushing
+    each block so a crash leaves everything compared so far on disk. cancel is an
+    optional threading.Event checked between blocks. Returns (blocks written, blocks
+    with differences, cancelled).
+    """
+    written = differs = 0
+    for block, diff in blocks:
+        if cancel is not None and cancel.is_set():
+            if hasattr(blocks, 'close'):
+                blocks.close()
+            out.write(f"\n{RULE}\nReport cancelled after {written} block(s).\n")
+            out.flush()
+            return written, differs, True
+        if written:
+            out.write("\n")
+        out.write(block)
+        out.flush()
+        written += 1
+        differs += diff
+    return written, differs, False
+
+def generate_report(main_folder, comp_folder, main_files, comp_files, matches, delimiters,
+                    workers=DEFAULT_WORKERS, store=None, reorder_mode=REORDER_POSITION, grouped=False):
+    """Return (report text, differs) where differs is True if any pair or file did not match."""
+    blocks, differs = [], False
+    for block, diff in iter_report(main_folder, comp_folder, main_files, comp_files, matches, delimiters,
+                                   workers, store, reorder_mode, grouped=grouped):
+        blocks.append(block)
+        differs = differs or diff
+    return "\n".join(blocks), differs
@@ -0,0 +1,243 @@
+"""Bounded header extraction: finds the first line terminator without reading whole files."""
+import codecs
+import re
+
+from archive_io import iter_tar_members, open_binary, zip_members
+
+HEADER_ENCODING = 'utf-8'
+# Code page assumed when the leading bytes are neither UTF-16/32 nor valid UTF-8
+DEFAULT_FALLBACK_ENCODING = 'cp1252'
+
+# Longest header accepted; a file without a terminator inside this many bytes is rejected
+DEFAULT_HEADER_LIMIT = 4 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+# Leading bytes inspected by detect_encoding()
+SNIFF_BYTES = 4096
+
+_EOL = re.compile(r'\r\n|\r|\n')
+
+# Longest BOM first: the UTF-32-LE BOM starts with the UTF-16-LE one
+_BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32-le'),
+    (codecs.BOM_UTF32_BE, 'utf-32-be'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+)
+
+class HeaderTooLong(ValueError):
+    def __init__(self, limit):
+        super().__init__(f"Header exceeds {limit} bytes")
+        self.limit = limit
+
+class ByteCount:
+    """Running total of the bytes handed out by the files passed through counted()."""
+    __slots__ = ('total',)
+
+    def __init__(self):
+        self.total = 0
+
+class _Replay:
+    """Reads what an earlier pass recorded from a forward-only stream, then the rest of the stream."""
+    __slots__ = ('head', 'f')
+
+    def __init__(self, head, f):
+        self.head, self.f = head, f
+
+    def read(self, size=-1):
+        if not self.head:
+            return self.f.read(size)
+        if size < 0:
+            data, self.head = self.head + self.f.read(), b''
+        else:
+            data, self.head = self.head[:size], self.head[size:]
+        return data
+
+class _Recorded:
+    __slots__ = ('f', 'data')
+
+    def __init__(self, f):
+        self.f, self.data = f, bytearray()
+
+    def read(self, size=-1):
+        chunk = self.f.read(size)
+        self.data += chunk
+        return chunk
+
+class _Counted:
+    __slots__ = ('f', 'counter')
+
+    def __init__(self, f, counter):
+        self.f, self.counter = f, counter
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.counter.total += len(data)
+        return data
+
+def counted(f, counter):
+    """f, or a wrapper adding what is read from it (after decompression) to counter."""
+    return f if counter is None else _Counted(f, counter)
+
+def detect_encoding(head, fallback=DEFAULT_FALLBACK_ENCODING):
+    """
+    Guess the encoding from the leading bytes of a file: a BOM first, then the NUL
+    pattern of BOM-less UTF-16, then UTF-8 validation, else the fallback code page.
+    Returns the codec name.
+    """
+    for bom, name in _BOMS:
+        if head.startswith(bom):
+            return name
+    sample = head[:SNIFF_BYTES]
+    half = len(sample) // 2
+    if half >= 2:
+        # Mostly-ASCII UTF-16 text has a NUL in every other byte
+        even_nuls, odd_nuls = sample[0::2].count(0), sample[1::2].count(0)
+        if odd_nuls >= half * 0.4 and even_nuls <= half * 0.05:
+            return 'utf-16-le'
+        if even_nuls >= half * 0.4 and odd_nuls <= half * 0.05:
+            return 'utf-16-be'
+    try:
+        sample.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off by the sample size is still valid UTF-8
+        if e.start < len(sample) - 3 or e.reason != 'unexpected end of data':
+            return fallback
+    return HEADER_ENCODING
+
+def bom_length(head, encoding):
+    for bom, name in _BOMS:
+        if name == encoding and head.startswith(bom):
+            return len(bom)
+    return 0
+
+def read_text_lines(f, count=1, limit=DEFAULT_HEADER_LIMIT, encoding=None, fallback=DEFAULT_FALLBACK_ENCODING):
+    """
+    Read up to count lines from the binary file object f using fixed-size chunks.
+    The leading bytes pick the encoding unless one is given (e.g. from an earlier
+    read of the same file). '\\n', '\\r\\n' and bare '\\r' all end a line; terminators
+    are not returned. Raises HeaderTooLong as soon as a line grows past limit bytes,
+    so a newline-less multi-GB file costs at most limit + CHUNK_SIZE bytes of memory.
+    Returns (lines, encoding).
+    """
+    chunk = f.read(CHUNK_SIZE)
+    if encoding is None:
+        encoding = detect_encoding(chunk, fallback)
+    skip = bom_length(chunk, encoding)
+    decoder = codecs.getincrementaldecoder(encoding)()
+    lines, buf = [], decoder.decode(chunk[skip:], final=not chunk)
+    line_bytes = len(chunk) - skip  # bytes read since the last line break (upper bound)
+    pos, eof = 0, not chunk
+    while len(lines) < count:
+        m = _EOL.search(buf, pos)
+        # A '\r' at the end of the buffer may be the first half of '\r\n'
+        if m and (eof or m.end() < len(buf) or m.group() != '\r'):
+            if m.start() > limit:
+                raise HeaderTooLong(limit)
+            lines.append(buf[:m.start()])
+            buf = buf[m.end():]
+            line_bytes = len(buf.encode(encoding, 'replace'))
+            pos = 0
+            continue
+        if line_bytes > limit:
+            raise HeaderTooLong(limit)
+        if eof:
+            if buf:
+                lines.append(buf)
+            break
+        pos = max(len(buf) - 1, 0)
+        chunk = f.read(CHUNK_SIZE)
+        eof = not chunk
+        buf += decoder.decode(chunk, final=eof)
+        line_bytes += len(chunk)
+    return lines, encoding
+
+def read_lines(file_path, count=1, limit=DEFAULT_HEADER_LIMIT, encoding=None, fallback=DEFAULT_FALLBACK_ENCODING,
+               counter=None):
+    """
+    Decoded first count lines of file_path (fewer if the file is shorter) and the
+    encoding used. If UTF-8 was only guessed and a later byte proves it wrong, the
+    file is read again with the fallback code page. Compressed files and archive
+    members are decompressed only as far as the lines requested. counter, a
+    ByteCount, is increased by the bytes read.
+    """
+    return _read_lines(lambda: open_binary(file_path), count, limit, encoding, fallback, counter)
+
+def _read_lines(opener, count, limit, encoding, fallback, counter):
+    try:
+        with opener() as f:
+            return read_text_lines(counted(f, counter), count, limit, encoding, fallback)
+    except UnicodeDecodeError:
+        if encoding is not None:
+            raise
+    with opener() as f:
+        return read_text_lines(counted(f, counter), count, limit, fallback, fallback)
+
+def read_header(file_path, limit=DEFAULT_HEADER_LIMIT, encoding=None, fallback=DEFAULT_FALLBACK_ENCODING,
+                counter=None):
+    """Return (line, encoding, error) for the first line of file_path without its line ending."""
+    try:
+        lines, encoding = read_lines(file_path, 1, limit, encoding, fallback, counter)
+    except Exception as e:
+        return None, encoding, str(e)
+    return (lines[0] if lines else ''), encoding, None
+
+def read_tar_headers(archive, members, limit=DEFAULT_HEADER_LIMIT, fallback=DEFAULT_FALLBACK_ENCODING,
+                     on_read=None):
+    """
+    read_header() for many members of one tar archive in a single streaming pass
+    (opening each member separately would decompress the archive from the start
+    every time). The bytes read from a member are kept until its line is found, so
+    a wrong UTF-8 guess is re-decoded with fallback without going back. on_read(member,
+    bytes read) is called after each member. Returns {member: (line, encoding, error)}.
+    """
+    found = {}
+    try:
+        for member, f in iter_tar_members(archive, members):
+            counter, recorded = ByteCount(), _Recorded(f)
+            try:
+                try:
+                    lines, encoding = read_text_lines(counted(recorded, counter), 1, limit, None, fallback)
+                except UnicodeDecodeError:
+                    replay = _Replay(bytes(recorded.data), counted(f, counter))
+                    lines, encoding = read_text_lines(replay, 1, limit, fallback, fallback)
+                found[member] = (lines[0] if lines else ''), encoding, None
+            except Exception as e:
+                found[member] = None, None, str(e)
+            if on_read is not None:
+                on_read(member, counter.total)
+    except Exception as e:
+        err = str(e)  # unreadable or truncated archive: members not reached fail with it
+    else:
+        err = f"Not found in {archive}"
+    return {m: found.get(m, (None, None, err)) for m in members}
+
+def read_zip_headers(archive, members, limit=DEFAULT_HEADER_LIMIT, fallback=DEFAULT_FALLBACK_ENCODING,
+                     on_read=None):
+    """
+    read_header() for many members of one zip archive, parsing its central directory
+    once (open_binary() parses it again for every member). on_read(member, bytes read)
+    is called after each member. Returns {member: (line, encoding, error)}.
+    """
+    found = {}
+    try:
+        with zip_members(archive) as open_member:
+            for member in members:
+                counter = ByteCount()
+                try:
+                    lines, encoding = _read_lines(lambda: open_member(member), 1, limit, None, fallback, counter)
+                    found[member] = (lines[0] if lines else ''), encoding, None
+                except Exception as e:
+                    found[member] = None, None, str(e)
+                if on_read is not None:
+                    on_read(member, counter.total)
+    except Exception as e:
+        return {m: found.get(m, (None, None, str(e))) for m in members}
+    return found
+
+def read_sample_rows(file_path, rows, limit=DEFAULT_HEADER_LIMIT, encoding=None, counter=None):
+    """Return up to rows data lines following the header ([] on any error)."""
+    try:
+        return read_lines(file_path, rows + 1, limit, encoding, counter=counter)[0][1:]
+    except Exception:
+        return []
@@ -0,0 +1,95 @@
+"""Run manifest: file identities and results of the last report, so the next run only redoes what changed."""
+import hashlib
+import json
+import os
+
+MANIFEST_VERSION = 1
+# The GUI keeps the manifest next to the report: report.txt -> report.txt.manifest.json
+MANIFEST_SUFFIX = '.manifest.json'
+
+def result_fingerprint(body):
+    """Hash of a pair's report body lines; equal results share it."""
+    return hashlib.blake2b("\n".join(body).encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+
+class RunManifest:
+    """
+    Maps main file -> record of the last comparison of its pair: comparison file,
+    both (size, mtime_ns) stamps, delimiter, reorder mode, rename cutoff, the read settings
+    (fallback code page and header limit), header fingerprints, encodings and the result (report body lines, result fingerprint, differs).
+    lookup() hands back a record only when every one of those inputs is unchanged;
+    a manifest written for other folders or by another version is ignored.
+    Auto-detected delimiters are kept the same way, so unchanged pairs are not even
+    read for detection.
+    """
+    def __init__(self, path, main_folder, comp_folder):
+        self.path = path
+        self.folders = [os.path.abspath(main_folder), os.path.abspath(comp_folder)]
+        self.previous, self.records = {}, {}
+        self.previous_detections, self.detections = {}, {}
+        self.reused = 0
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return  # no usable manifest: everything is compared
+        if data.get('version') == MANIFEST_VERSION and data.get('folders') == self.folders:
+            self.previous = data.get('pairs', {})
+            self.previous_detections = data.get('detections', {})
+
+    def detection(self, main_file, comp_file, main_stamp, comp_stamp, sample_rows, read_with=None):
+        """Return the earlier (delimiter, confidence) detected for the pair if it is unchanged, else None."""
+        rec = self.previous_detections.get(main_file)
+        if (rec is None or main_stamp is None or rec['comp'] != comp_file or rec['sample_rows'] != sample_rows
+                or rec['stamps'] != [list(main_stamp), list(comp_stamp) if comp_stamp else None]
+                or rec.get('read_with') != read_with):
+            return None
+        self.detections[main_file] = rec
+        return rec['delimiter'], rec['confidence']
+
+    def record_detection(self, main_file, comp_file, main_stamp, comp_stamp, sample_rows, delimiter, confidence,
+                         read_with=None):
+        if main_stamp is None:
+            return
+        self.detections[main_file] = {
+            'comp': comp_file, 'stamps': [list(main_stamp), list(comp_stamp) if comp_stamp else None],
+            'sample_rows': sample_rows, 'read_with': read_with, 'delimiter': delimiter, 'confidence': confidence}
+
+    def lookup(self, main_file, comp_file, main_stamp, comp_stamp, delimiter, reorder_mode, rename_cutoff=None,
+               read_with=None):
+        """Return the earlier record for the pair if nothing it depends on changed, else None."""
+        rec = self.previous.get(main_file)
+        if (rec is None or main_stamp is None or comp_stamp is None or rec['comp'] != comp_file
+                or rec['stamps'] != [list(main_stamp), list(comp_stamp)]
+                or rec['delimiter'] != delimiter or rec['reorder'] != reorder_mode
+                or rec.get('renames') != rename_cutoff or rec.get('read_with') != read_with):
+            return None
+        self.records[main_file] = rec
+        self.reused += 1
+        return rec
+
+    def record(self, main_file, comp_file, main_stamp, comp_stamp, delimiter, reorder_mode,
+               fingerprints, encodings, body, differs, rename_cutoff=None, read_with=None):
+        """Remember a freshly compared pair; pairs with an unreadable side are always compared again."""
+        if main_stamp is None or comp_stamp is None:
+            return
+        self.records[main_file] = {
+            'comp': comp_file, 'stamps': [list(main_stamp), list(comp_stamp)],
+            'delimiter': delimiter, 'reorder': reorder_mode, 'renames': rename_cutoff, 'read_with': read_with,
+            'fingerprints': list(fingerprints), 'encodings': list(encodings),
+            'result': result_fingerprint(body), 'body': body, 'differs': differs}
+
+    def save(self, complete=True):
+        """
+        Write the manifest atomically. After a complete run it holds exactly this run's
+        pairs; after a cancelled one earlier records of pairs not reached are kept.
+        """
+        pairs = self.records if complete else {**self.previous, **self.records}
+        detections = self.detections if complete else {**self.previous_detections, **self.detections}
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'folders': self.folders, 'pairs': pairs,
+                       'detections': detections}, f)
+        os.replace(tmp, self.path)
@@ -0,0 +1,122 @@
+"""Per-phase run instrumentation: wall time, call counts, bytes read and the slowest files; optional cProfile."""
+import cProfile
+import heapq
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+STATS_VERSION = 1
+# Sidecars live next to the report: report.txt -> report.txt.stats.json / report.txt.prof
+STATS_SUFFIX = '.stats.json'
+PROFILE_SUFFIX = '.prof'
+SLOWEST_FILES = 10
+
+class RunStats:
+    """
+    Accumulates, per phase: exclusive wall time (time spent in a nested phase, e.g.
+    header reads started while detecting delimiters, counts only for the inner one),
+    how often the phase was entered, how many items it handled and the bytes it
+    read. Phases are entered from the thread driving the run; count() and
+    file_read() may also be called from reader threads.
+    """
+    def __init__(self, slowest=SLOWEST_FILES):
+        self.phases = {}  # name -> {'seconds', 'calls', 'items', 'bytes'} in first-seen order
+        self.slowest_limit = slowest
+        self._slowest = []  # min-heap of (seconds, path, bytes)
+        self._stack = []  # time spent in nested phases, per open phase
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def _phase(self, name):
+        return self.phases.setdefault(name, {'seconds': 0.0, 'calls': 0, 'items': 0, 'bytes': 0})
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        self._stack.append(0.0)
+        try:
+            yield self
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            with self._lock:
+                p = self._phase(name)
+                p['seconds'] += elapsed - nested
+                p['calls'] += 1
+
+    def count(self, name, items=1, nbytes=0):
+        with self._lock:
+            p = self._phase(name)
+            p['items'] += items
+            p['bytes'] += nbytes
+
+    def file_read(self, path, seconds, nbytes, name='read'):
+        """Count one file read of the phase and keep it if it is among the slowest."""
+        with self._lock:
+            p = self._phase(name)
+            p['items'] += 1
+            p['bytes'] += nbytes
+            item = (seconds, path, nbytes)
+            if len(self._slowest) < self.slowest_limit:
+                heapq.heappush(self._slowest, item)
+            elif item > self._slowest[0]:
+                heapq.heapreplace(self._slowest, item)
+
+    def slowest(self):
+        with self._lock:
+            return sorted(self._slowest, reverse=True)
+
+    def copy(self):
+        """A new RunStats starting with this one's numbers (e.g. a compare run after loading)."""
+        other = RunStats(self.slowest_limit)
+        with self._lock:
+            other.phases = {n: dict(p) for n, p in self.phases.items()}
+            other._slowest = list(self._slowest)
+        return other
+
+    def total(self):
+        return sum(p['seconds'] for p in self.phases.values())
+
+    def as_dict(self):
+        return {'version': STATS_VERSION, 'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+                'total_seconds': self.total(), 'phases': self.phases,
+                'slowest_files': [{'path': p, 'seconds': s, 'bytes': b} for s, p, b in self.slowest()]}
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.as_dict(), f, indent=1)
+
+    def lines(self):
+        out = [f"{'Phase':<10} {'Seconds':>10} {'Calls':>7} {'Items':>9} {'Bytes':>14}"]
+        for name, p in self.phases.items():
+            out.append(f"{name:<10} {p['seconds']:10.3f} {p['calls']:7d} {p['items']:9d} {p['bytes']:14,d}")
+        out.append(f"{'total':<10} {self.total():10.3f}")
+        slow = self.slowest()
+        if slow:
+            out.append("Slowest files:")
+            out += [f" - {s:.3f}s {b:,d} bytes {p}" for s, p, b in slow]
+        return out
+
+    def format_footer(self, rule):
+        return "\n".join([rule, "Run stats", rule] + self.lines() + [rule, ""])
+
+def timed(stats, name):
+    """stats.phase(name), or a no-op when no RunStats is collected."""
+    return stats.phase(name) if stats is not None else nullcontext()
+
+@contextmanager
+def profiled(path):
+    """Run the body under cProfile and dump the profile to path (read it with pstats or snakeviz); None = off."""
+    if path is None:
+        yield
+        return
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile.dump_stats(path)
@@ -0,0 +1,150 @@
+"""N-way comparison: a reference schema index read once and checked against any number of folders."""
+import json
+import os
+from collections import namedtuple
+
+from header_engine import (DEFAULT_WORKERS, REORDER_POSITION, RULE, HeaderStore, compare_headers,
+                           detect_delimiters, find_files, format_result, format_unmatched, header_fingerprint,
+                           header_from_line, match_files)
+from file_matcher import DEFAULT_CUTOFF
+
+SCHEMA_VERSION = 1
+
+# Drift matrix cell states
+CELL_MATCH = 'match'
+CELL_DIFF = 'DIFF'
+CELL_MISSING = 'missing'
+CELL_ERROR = 'error'
+
+# One reference header; line is None and error set when the reference file could not be read
+SchemaEntry = namedtuple('SchemaEntry', 'name line delimiter encoding error')
+# Cell of the drift matrix: state, matched file in the checked folder ('' if none), report block
+Cell = namedtuple('Cell', 'state comp_file block')
+# Outcome of SchemaIndex.check(): {reference name: Cell} and the folder's files not in the index
+FolderResult = namedtuple('FolderResult', 'folder label cells extra')
+
+def folder_labels(folders):
+    """Short matrix column names: the folder base names, numbered when two are the same."""
+    labels = [os.path.basename(os.path.normpath(f)) or f for f in folders]
+    return [f"{l}#{i + 1}" if labels.count(l) > 1 else l for i, l in enumerate(labels)]
+
+class SchemaIndex:
+    """
+    Canonical headers keyed by file name (relative path), each with the delimiter it
+    is split with. Built once from a reference folder or loaded from a saved schema
+    file; check() then compares a folder against it, reading only that folder.
+    Comparisons are memoized per (reference header, folder header, delimiter, mode)
+    across all checked folders.
+    """
+    def __init__(self, entries, source=''):
+        self.entries = {e.name: e for e in entries}
+        self.source = source
+        self._fingerprints = {e.name: header_fingerprint(e.line) for e in entries if e.line is not None}
+        self._columns = {}
+        self._comparisons = {}
+
+    @classmethod
+    def from_folder(cls, folder, store=None, workers=DEFAULT_WORKERS, scan=(), delimiter='auto', sample_rows=0):
+        """Index the headers of folder; delimiter 'auto' detects one per file, otherwise it is used for all."""
+        store = store or HeaderStore(workers)
+        files = find_files(folder, *scan)
+        if delimiter == 'auto':
+            detections = detect_delimiters(folder, folder, dict.fromkeys(files, ''), workers, store, sample_rows)
+            delimiters = {f: d.delimiter for f, d in detections.items()}
+        else:
+            store.prefetch([os.path.join(folder, f) for f in files], workers)
+            delimiters = dict.fromkeys(files, delimiter)
+        entries = []
+        for f in files:
+            path = os.path.join(folder, f)
+            line, err = store.line(path)
+            entries.append(SchemaEntry(f, line, delimiters[f], store.encoding(path), err))
+        return cls(entries, folder)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != SCHEMA_VERSION:
+            raise ValueError(f"Unsupported schema version: {data.get('version')}")
+        entries = [SchemaEntry(e['name'], e['line'], e['delimiter'], e.get('encoding'), e.get('error'))
+                   for e in data['files']]
+        return cls(entries, data.get('source') or path)
+
+    def save(self, path):
+        data = {'version': SCHEMA_VERSION, 'source': self.source,
+                'files': [e._asdict() for e in self.entries.values()]}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1, ensure_ascii=False)
+
+    def columns(self, name):
+        """Return (columns, error) of a reference header."""
+        if name not in self._columns:
+            e = self.entries[name]
+            self._columns[name] = header_from_line(e.line, e.error, e.delimiter)
+        return self._columns[name]
+
+    def compare(self, name, path, store, reorder_mode=REORDER_POSITION):
+        """Like HeaderStore.compare() with the reference header of name on the main side."""
+        delim = self.entries[name].delimiter
+        mcols, me = self.columns(name)
+        ccols, ce = store.columns(path, delim)
+        if me or ce or not mcols or not ccols:
+            return (None, (me or 'Header missing') if me or not mcols else None,
+                    (ce or 'Header missing') if ce or not ccols else None)
+        key = (self._fingerprints[name], store.fingerprint(path), delim, reorder_mode, store.rename_cutoff)
+        result = self._comparisons.get(key)
+        if result is None:
+            result = self._comparisons[key] = compare_headers(mcols, ccols, reorder_mode, store.rename_cutoff)
+        return result, None, None
+
+    def check(self, folder, store=None, workers=DEFAULT_WORKERS, scan=(), reorder_mode=REORDER_POSITION,
+              cutoff=DEFAULT_CUTOFF, label=None):
+        """Compare every indexed file with its match in folder; returns a FolderResult."""
+        store = store or HeaderStore(workers)
+        label = label or folder_labels([folder])[0]
+        files = find_files(folder, *scan)
+        matches = match_files(list(self.entries), files, cutoff)
+        paths = {name: os.path.join(folder, cf) for name, cf in matches.items() if cf}
+        store.prefetch(list(paths.values()), workers)
+        cells = {}
+        for name, entry in self.entries.items():
+            cf = matches[name]
+            if not cf:
+                cells[name] = Cell(CELL_MISSING, '', None)
+                continue
+            result, me, ce = self.compare(name, paths[name], store, reorder_mode)
+            block, _ = format_result(name, f"{label}/{cf}", result, me, ce, (entry.encoding, store.encoding(paths[name])))
+            if result is None:
+                cells[name] = Cell(CELL_ERROR, cf, block)
+            else:
+                cells[name] = Cell(CELL_MATCH if result.exact else CELL_DIFF, cf, block)
+        extra = sorted(set(files) - set(matches.values()))
+        return FolderResult(folder, label, cells, extra)
+
+def format_matrix(index, results):
+    """Text table with one row per reference file and one column per checked folder."""
+    names = list(index.entries)
+    labels = [r.label for r in results]
+    width = max([len("File")] + [len(n) for n in names])
+    widths = [max(len(l), len(CELL_MISSING)) for l in labels]
+    out = [RULE, f"Drift matrix against {index.source} ({len(names)} file(s), {len(results)} folder(s))", RULE,
+           " | ".join([f"{'File':<{width}}"] + [f"{l:<{w}}" for l, w in zip(labels, widths)])]
+    out.append("-+-".join(["-" * width] + ["-" * w for w in widths]))
+    for n in names:
+        out.append(" | ".join([f"{n:<{width}}"] + [f"{r.cells[n].state:<{w}}" for r, w in zip(results, widths)]))
+    out.append(RULE)
+    out.append("")
+    return "\n".join(out)
+
+def iter_nway_report(index, results):
+    """Yield (block, differs): the matrix, then the drifting or failing cells per folder, then extra files."""
+    differs = any(c.state != CELL_MATCH for r in results for c in r.cells.values()) or any(r.extra for r in results)
+    yield format_matrix(index, results), differs
+    for r in results:
+        for name, cell in r.cells.items():
+            if cell.state in (CELL_DIFF, CELL_ERROR):
+                yield cell.block, True
+    for r in results:
+        if r.extra:
+            yield format_unmatched(f"Not in reference ({r.label})", r.extra), True